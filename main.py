@@ -1,22 +1,3148 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 import customtkinter as ctk
-import requests
 import time
-from geopy.distance import geodesic
 import json
+import csv
 import re
+import sys
 import threading
-from queue import Queue
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
+import argparse
+import subprocess
 from pathlib import Path
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+import heapq
+import itertools
+import math
+
+# requests and geopy are imported on first use (see the startup benchmark) so
+# the window can paint before the networking stack has been loaded
 
 # Configure CustomTkinter
 ctk.set_appearance_mode("dark")  # "dark" or "light"
 ctk.set_default_color_theme("blue")  # "blue", "green", "dark-blue"
 
-# Cache file location
-CACHE_FILE = Path.home() / ".address_distance_cache.json"
+# Cache file location
+CACHE_FILE = Path.home() / ".address_distance_cache.json"
+
+# Addresses that could not be geocoded, with the time of the last failed lookup
+NEGATIVE_CACHE_FILE = Path.home() / ".address_distance_not_found.json"
+
+# Default time before a not-found address is looked up again
+NEGATIVE_CACHE_TTL_DAYS = 30
+
+# Default geocode cache size caps (config: cache_max_entries, cache_max_mb)
+CACHE_MAX_ENTRIES = 200000
+CACHE_MAX_MB = 50
+
+# Read-only binary geocode store built from a national address file
+GEOCODE_STORE_FILE = Path.home() / ".address_distance_geostore.bin"
+
+# Postcode centroids for placing sites without network geocoding
+POSTCODE_INDEX_FILE = Path.home() / ".address_distance_postcodes.json"
+
+# Precomputed depot x site route matrix (.npy) and its index (.json)
+ROUTE_MATRIX_FILE = Path.home() / ".address_distance_matrix.npy"
+
+# Road speed and detour model fitted from routed results
+SPEED_MODEL_FILE = Path.home() / ".address_distance_speed_model.json"
+
+# Optional settings file (geocoder/router backends, limits)
+CONFIG_FILE = Path.home() / ".address_distance_config.json"
+
+
+class FileLock:
+    """Exclusive lock shared between processes, held on a sidecar '<file>.lock'
+    
+    Uses fcntl on POSIX and msvcrt on Windows. A thread lock is held as well,
+    since OS file locks do not exclude threads of the same process.
+    """
+    _thread_locks = {}
+    _registry_lock = threading.Lock()
+    
+    def __init__(self, path, timeout=30):
+        self.lock_path = Path(str(path) + '.lock')
+        self.timeout = timeout
+        self.handle = None
+        with FileLock._registry_lock:
+            self.thread_lock = FileLock._thread_locks.setdefault(str(self.lock_path), threading.RLock())
+    
+    def _try_lock(self):
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+    
+    def __enter__(self):
+        self.thread_lock.acquire()
+        self.handle = open(self.lock_path, 'a+')
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock():
+            if time.monotonic() > deadline:
+                self.handle.close()
+                self.thread_lock.release()
+                raise TimeoutError(f"Timed out waiting for {self.lock_path}")
+            time.sleep(0.05)
+        return self
+    
+    def __exit__(self, *exc):
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.handle.close()
+            self.thread_lock.release()
+
+
+def read_json_file(path):
+    """Read a JSON store, moving a corrupt file aside instead of discarding it
+    
+    Returns {} when the file is missing or unreadable.
+    """
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError as e:
+        backup = path.with_name(f"{path.name}.corrupt-{int(time.time())}")
+        os.replace(path, backup)
+        print(f"⚠ {path.name} was corrupt ({e}); kept a copy at {backup}")
+        return {}
+
+
+def write_file_atomic(path, write, mode='w'):
+    """Write a file via a temporary file and rename, so readers never see a partial file
+    
+    write(f) is called with the open temporary file.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Write JSON atomically (see write_file_atomic)"""
+    write_file_atomic(path, lambda f: json.dump(data, f, ensure_ascii=False, **dump_kwargs))
+
+
+# Compact record types - sites, cache entries and results are held in large
+# numbers, so they use __slots__ instead of one dict per record
+
+class CacheEntry:
+    """Geocoded location stored in the persistent cache, with access metadata"""
+    __slots__ = ('lat', 'lon', 'match_level', 'match_desc', 'created', 'last_access', 'hits')
+    
+    def __init__(self, lat, lon, match_level=0, match_desc='exact', created=None, last_access=None, hits=0):
+        self.lat = lat
+        self.lon = lon
+        self.match_level = match_level
+        self.match_desc = sys.intern(match_desc)
+        self.created = created if created is not None else time.time()
+        self.last_access = last_access if last_access is not None else self.created
+        self.hits = hits
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build an entry from its JSON representation"""
+        # Entries written before access metadata existed count as created now
+        return cls(data['lat'], data['lon'], data.get('match_level', 0), data.get('match_desc', 'exact'),
+                   data.get('created'), data.get('last_access'), data.get('hits', 0))
+    
+    def to_dict(self):
+        """JSON representation used in the cache file"""
+        return {
+            'lat': self.lat,
+            'lon': self.lon,
+            'match_level': self.match_level,
+            'match_desc': self.match_desc,
+            'created': round(self.created),
+            'last_access': round(self.last_access),
+            'hits': self.hits
+        }
+    
+    def touch(self):
+        self.last_access = time.time()
+        self.hits += 1
+
+
+class GeocodeCache:
+    """Bounded geocode cache with LRU or LFU eviction and hit statistics
+    
+    Entries are kept in least-recently-used order. When the cache grows past
+    max_entries or max_bytes (estimated serialized size) the coldest entries
+    are evicted in one batch, leaving some headroom so eviction is not repeated
+    on every insert.
+    """
+    ENTRY_OVERHEAD = 130  # approximate serialized bytes per entry, excluding the key
+    EVICTION_HEADROOM = 0.05
+    AGE_BUCKETS = [('< 1 day', 86400), ('< 1 week', 7 * 86400), ('< 1 month', 30 * 86400),
+                   ('< 6 months', 182 * 86400), ('older', float('inf'))]
+    
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_MB * 1024 * 1024, policy='lru'):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Keys inserted that this cache did not hold - lets callers skip saves with nothing new
+        self.added = 0
+        self.dirty = False
+        # Key mapping applied to entries read from disk, so files written with older
+        # key formats are hit by canonical lookups (None keeps keys as stored)
+        self.rekey = canonical_key
+        self.lock = threading.RLock()
+    
+    def entry_size(self, key):
+        return len(key.encode('utf-8')) + self.ENTRY_OVERHEAD
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __contains__(self, key):
+        return key in self.entries
+    
+    def get(self, key):
+        """Return the entry for key (recording the access), or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.touch()
+            self.entries.move_to_end(key)
+            self.dirty = True
+            return entry
+    
+    def put(self, key, entry, enforce=True):
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entry_size(key)
+            else:
+                self.added += 1
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.bytes += self.entry_size(key)
+            self.dirty = True
+            if enforce:
+                self.enforce_limits(self.EVICTION_HEADROOM)
+    
+    def put_many(self, items):
+        """Insert (key, entry) pairs under one lock, enforcing the caps once - returns the number of new keys"""
+        added = 0
+        with self.lock:
+            for key, entry in items:
+                if key in self.entries:
+                    self.bytes -= self.entry_size(key)
+                else:
+                    added += 1
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+                self.bytes += self.entry_size(key)
+            self.added += added
+            self.dirty = True
+            self.enforce_limits(self.EVICTION_HEADROOM)
+        return added
+    
+    def items(self):
+        with self.lock:
+            return list(self.entries.items())
+    
+    def over_limits(self, headroom=0.0):
+        return (len(self.entries) > self.max_entries * (1 - headroom)
+                or self.bytes > self.max_bytes * (1 - headroom))
+    
+    def enforce_limits(self, headroom=0.0):
+        """Evict the coldest entries once the cache exceeds a cap - returns the count"""
+        with self.lock:
+            if not self.over_limits():
+                return 0
+            
+            if self.policy == 'lfu':
+                victims = sorted(self.entries, key=lambda k: (self.entries[k].hits, self.entries[k].last_access))
+            else:
+                victims = iter(self.entries)
+            
+            count, size = len(self.entries), self.bytes
+            target_entries = self.max_entries * (1 - headroom)
+            target_bytes = self.max_bytes * (1 - headroom)
+            
+            evicted = []
+            for key in victims:
+                if count <= target_entries and size <= target_bytes:
+                    break
+                evicted.append(key)
+                count -= 1
+                size -= self.entry_size(key)
+            
+            for key in evicted:
+                del self.entries[key]
+            self.bytes = size
+            self.evictions += len(evicted)
+            if evicted:
+                self.dirty = True
+            return len(evicted)
+    
+    def compact(self):
+        """Evict down to the caps without headroom - returns the number of entries removed"""
+        return self.enforce_limits(0.0)
+    
+    def canonicalise(self, key_func):
+        """Re-key every entry with key_func, merging entries whose keys collide
+        
+        The next save re-keys the entries on disk the same way, so the old keys
+        are not merged back in. Returns the number of entries merged away.
+        """
+        with self.lock:
+            merged = OrderedDict()
+            for key, entry in self.entries.items():
+                key = key_func(key)
+                # Entries are in access order, so the later copy is the more recent one
+                current = merged.pop(key, None)
+                if current is not None:
+                    entry.hits += current.hits
+                merged[key] = entry
+            
+            removed = len(self.entries) - len(merged)
+            self.entries = merged
+            self.bytes = sum(self.entry_size(key) for key in merged)
+            self.rekey = key_func
+            self.dirty = True
+            return removed
+    
+    def merge(self, raw):
+        """Merge entries read from disk - the copy accessed most recently wins
+        
+        Returns the number of keys that were new to this cache.
+        """
+        if self.rekey:
+            rekeyed = {}
+            for key, data in raw.items():
+                # Keys this cache already holds are in the current form
+                if key not in self.entries:
+                    key = self.rekey(key)
+                if key not in rekeyed or data.get('last_access', 0) > rekeyed[key].get('last_access', 0):
+                    rekeyed[key] = data
+            raw = rekeyed
+        
+        added = replaced = 0
+        with self.lock:
+            for key, data in raw.items():
+                entry = CacheEntry.from_dict(data)
+                current = self.entries.get(key)
+                if current is None:
+                    added += 1
+                elif current.last_access >= entry.last_access:
+                    current.hits = max(current.hits, entry.hits)
+                    continue
+                else:
+                    replaced += 1
+                    self.bytes -= self.entry_size(key)
+                self.entries[key] = entry
+                self.bytes += self.entry_size(key)
+            
+            if added or replaced:
+                # Restore least-recently-used order across both sources
+                self.entries = OrderedDict(sorted(self.entries.items(), key=lambda item: item[1].last_access))
+                self.dirty = True
+        return added
+    
+    def load(self, path):
+        """Load entries from a JSON cache file"""
+        with FileLock(path):
+            raw = read_json_file(path)
+        with self.lock:
+            self.merge(raw)
+            self.enforce_limits(self.EVICTION_HEADROOM)
+            self.dirty = False
+    
+    def save(self, path):
+        """Merge with the file on disk and write it back atomically
+        
+        Runs under an inter-process lock, so concurrent app instances and batch
+        workers add to one shared cache instead of overwriting each other.
+        Returns the number of entries picked up from other processes.
+        """
+        with FileLock(path):
+            added = self.merge(read_json_file(path))
+            with self.lock:
+                self.enforce_limits(self.EVICTION_HEADROOM)
+                data = {key: entry.to_dict() for key, entry in self.entries.items()}
+                self.dirty = False
+            write_json_atomic(path, data, separators=(',', ':'))
+        return added
+    
+    def stats(self, path=None):
+        """Entry count, hit rate, size and age distribution"""
+        now = time.time()
+        ages = {name: 0 for name, _ in self.AGE_BUCKETS}
+        for _, entry in self.items():
+            age = now - entry.created
+            for name, limit in self.AGE_BUCKETS:
+                if age < limit:
+                    ages[name] += 1
+                    break
+        
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'estimated_bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'disk_bytes': path.stat().st_size if path and path.exists() else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'policy': self.policy,
+            'age_distribution': ages
+        }
+
+
+def format_cache_stats(stats):
+    """Human-readable cache statistics"""
+    MB = 1024 * 1024
+    lines = [
+        f"Entries:      {stats['entries']:,} / {stats['max_entries']:,}",
+        f"Size:         {stats['estimated_bytes'] / MB:.1f} MB in memory (cap {stats['max_bytes'] / MB:.0f} MB), "
+        f"{stats['disk_bytes'] / MB:.1f} MB on disk",
+        f"Hit rate:     {stats['hit_rate']:.0%} ({stats['hits']:,} hits, {stats['misses']:,} misses this session)",
+        f"Evictions:    {stats['evictions']:,} ({stats['policy'].upper()})",
+        "Age:"
+    ]
+    for name, count in stats['age_distribution'].items():
+        lines.append(f"  {name:<12}{count:,}")
+    return '\n'.join(lines)
+
+
+class NegativeCache:
+    """Canonical address keys that failed every geocoding attempt, kept for `ttl` seconds"""
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}
+        self.removed = set()
+        self.added = 0
+    
+    def __contains__(self, key):
+        failed_at = self.entries.get(key)
+        return failed_at is not None and time.time() - failed_at < self.ttl
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def add(self, key):
+        self.entries[key] = time.time()
+        self.removed.discard(key)
+        self.added += 1
+    
+    def discard(self, key):
+        self.entries.pop(key, None)
+        # Remember the removal so merging with the file does not bring it back
+        self.removed.add(key)
+    
+    def merge(self, raw):
+        """Merge entries from disk, keeping the most recent failure time"""
+        for key, failed_at in raw.items():
+            if key not in self.removed and failed_at > self.entries.get(key, 0):
+                self.entries[key] = failed_at
+    
+    def load(self, path):
+        """Load unexpired entries from a JSON file of key -> failure timestamp"""
+        with FileLock(path):
+            self.merge(read_json_file(path))
+        self.prune()
+    
+    def prune(self):
+        """Drop entries older than the TTL"""
+        now = time.time()
+        self.entries = {k: t for k, t in self.entries.items() if now - t < self.ttl}
+    
+    def save(self, path):
+        """Merge with the file on disk and write it back atomically"""
+        with FileLock(path):
+            self.merge(read_json_file(path))
+            self.prune()
+            write_json_atomic(path, self.entries, indent=2)
+        self.removed.clear()
+
+
+class GeocodeStore:
+    """Read-only geocode store for millions of addresses, memory-mapped from disk
+    
+    File layout (little-endian, sections 8-byte aligned):
+        header   magic, record count, hash table slots, key bytes length
+        coords   int32 (lat, lon) in micro-degrees, one pair per record
+        offsets  uint64 start of each record's key in the key bytes (count + 1)
+        table    uint32 open-addressing hash table of record number + 1 (0 = empty)
+        keys     UTF-8 cache keys, concatenated
+    A lookup hashes the key, probes the table and compares the stored key bytes,
+    so nothing is parsed or loaded up front.
+    """
+    MAGIC = b'ADGSTOR1'
+    HEADER_SIZE = 32
+    
+    def __init__(self, path=GEOCODE_STORE_FILE):
+        self.path = Path(path)
+        self.count = 0
+    
+    def __len__(self):
+        return self.count
+    
+    @staticmethod
+    def key_hash(key_bytes):
+        """Stable 64-bit hash of a key (Python's hash() differs between processes)"""
+        import hashlib
+        
+        return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), 'little')
+    
+    @classmethod
+    def layout(cls, count, slots):
+        """Byte offsets of the coords, offsets, table and keys sections"""
+        def align(n):
+            return (n + 7) & ~7
+        
+        coords = cls.HEADER_SIZE
+        offsets = coords + align(count * 8)
+        table = offsets + (count + 1) * 8
+        keys = table + align(slots * 4)
+        return coords, offsets, table, keys
+    
+    def load(self):
+        """Memory-map the store file - returns False if there is no usable store"""
+        import struct
+        import numpy as np
+        
+        if not self.path.exists():
+            return False
+        
+        data = np.memmap(self.path, dtype=np.uint8, mode='r')
+        magic, count, slots, keys_len = struct.unpack('<8sQQQ', data[:self.HEADER_SIZE].tobytes())
+        coords, offsets, table, keys = self.layout(count, slots)
+        if magic != self.MAGIC or len(data) != keys + keys_len:
+            print(f"⚠ Geocode store {self.path} is not a valid store file, ignoring it")
+            return False
+        
+        self.coords = data[coords:coords + count * 8].view(np.int32).reshape(-1, 2)
+        self.offsets = data[offsets:table].view(np.uint64)
+        self.table = data[table:table + slots * 4].view(np.uint32)
+        self.keys = data[keys:]
+        self.mask = slots - 1
+        self.count = count
+        return True
+    
+    def get(self, key):
+        """(lat, lon) for a cache key, or None"""
+        if not self.count:
+            return None
+        
+        key_bytes = key.encode('utf-8')
+        slot = self.key_hash(key_bytes) & self.mask
+        while True:
+            record = int(self.table[slot])
+            if not record:
+                return None
+            record -= 1
+            start, end = int(self.offsets[record]), int(self.offsets[record + 1])
+            if end - start == len(key_bytes) and self.keys[start:end].tobytes() == key_bytes:
+                lat, lon = self.coords[record]
+                return int(lat) / 1e6, int(lon) / 1e6
+            slot = (slot + 1) & self.mask
+    
+    @classmethod
+    def build(cls, path, records):
+        """Write a store from (key, lat, lon) records atomically - returns the record count
+        
+        The first record for a key wins. The hash table is kept at most half full.
+        """
+        import struct
+        import numpy as np
+        
+        keys, lats, lons = [], [], []
+        seen = set()
+        for key, lat, lon in records:
+            key_bytes = key.encode('utf-8')
+            if key_bytes in seen:
+                continue
+            seen.add(key_bytes)
+            keys.append(key_bytes)
+            lats.append(lat)
+            lons.append(lon)
+        del seen
+        
+        count = len(keys)
+        slots = 1 << max(4, (2 * count).bit_length())
+        mask = slots - 1
+        table = [0] * slots
+        for record, key_bytes in enumerate(keys):
+            slot = cls.key_hash(key_bytes) & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = record + 1
+        
+        coords = np.empty((count, 2), dtype=np.int32)
+        coords[:, 0] = np.round(np.asarray(lats, dtype=np.float64) * 1e6)
+        coords[:, 1] = np.round(np.asarray(lons, dtype=np.float64) * 1e6)
+        offsets = np.zeros(count + 1, dtype=np.uint64)
+        np.cumsum(np.fromiter(map(len, keys), dtype=np.uint64, count=count), out=offsets[1:])
+        key_data = b''.join(keys)
+        
+        coords_at, offsets_at, table_at, keys_at = cls.layout(count, slots)
+        
+        def write(f):
+            f.write(struct.pack('<8sQQQ', cls.MAGIC, count, slots, len(key_data)))
+            f.write(coords.tobytes())
+            f.write(bytes(offsets_at - coords_at - coords.nbytes))
+            f.write(offsets.tobytes())
+            f.write(np.asarray(table, dtype=np.uint32).tobytes())
+            f.write(bytes(keys_at - table_at - slots * 4))
+            f.write(key_data)
+        
+        write_file_atomic(Path(path), write, 'wb')
+        return count
+
+
+class PostcodeIndex:
+    """Postcode centroids with a radius covering the postcode's localities
+    
+    Built once from a postcode CSV and stored as JSON: postcode -> [lat, lon,
+    radius_km, state]. Lets sites be placed (and far ones ranked) without
+    waiting for the geocoder.
+    """
+    MIN_RADIUS_KM = 2.0
+    
+    def __init__(self, path=POSTCODE_INDEX_FILE):
+        self.path = Path(path)
+        self.centroids = {}
+    
+    def __len__(self):
+        return len(self.centroids)
+    
+    def load(self):
+        """Load the index - returns False if there is none"""
+        self.centroids = read_json_file(self.path)
+        return bool(self.centroids)
+    
+    def get(self, postcode):
+        """(lat, lon, radius_km) for a postcode, or None"""
+        centroid = self.centroids.get(postcode) if postcode else None
+        return tuple(centroid[:3]) if centroid else None
+    
+    @classmethod
+    def build(cls, path, records):
+        """Write an index from (postcode, lat, lon, state) rows - returns the postcode count
+        
+        Rows for the same postcode (one per locality in most files) are averaged
+        into a centroid whose radius reaches the furthest of them.
+        """
+        import numpy as np
+        
+        grouped = {}
+        for postcode, lat, lon, state in records:
+            grouped.setdefault(postcode, ([], state))[0].append((lat, lon))
+        
+        centroids = {}
+        for postcode, (points, state) in grouped.items():
+            points = np.asarray(points, dtype=np.float64)
+            centre = points.mean(axis=0)
+            radius = float(estimate_routes(centre, points)[0].max()) + cls.MIN_RADIUS_KM
+            centroids[postcode] = [round(float(centre[0]), 6), round(float(centre[1]), 6), round(radius, 2), state]
+        write_json_atomic(Path(path), centroids, separators=(',', ':'))
+        return len(centroids)
+
+
+class Site:
+    """A site address from the input list, with its location once geocoded"""
+    __slots__ = ('address', 'suburb', 'state', 'postcode', 'status', 'lat', 'lon', 'match_level', 'match_desc',
+                 '_cache_key')
+    
+    def __init__(self, address, suburb, state, status='pending', postcode=''):
+        self.address = address
+        self.suburb = suburb
+        self.state = state
+        self.postcode = postcode
+        self._cache_key = None
+        self.status = status
+        self.lat = None
+        self.lon = None
+        self.match_level = 0
+        self.match_desc = 'exact'
+    
+    @property
+    def full_address(self):
+        # The postcode tells same-named suburbs apart in geocoder queries
+        if self.postcode:
+            return f"{self.address}, {self.suburb}, {self.state} {self.postcode}"
+        return f"{self.address}, {self.suburb}, {self.state}"
+    
+    @property
+    def cache_key(self):
+        if self._cache_key is None:
+            self._cache_key = canonical_address(self.address, self.suburb, self.state)
+        return self._cache_key
+    
+    def copy(self):
+        """Independent copy, so a queued job is unaffected by later changes to the list"""
+        site = Site(self.address, self.suburb, self.state, self.status, self.postcode)
+        site.lat, site.lon = self.lat, self.lon
+        site.match_level, site.match_desc = self.match_level, self.match_desc
+        return site
+    
+    def apply_location(self, entry):
+        """Copy a cached or freshly geocoded location onto the site"""
+        self.lat = entry.lat
+        self.lon = entry.lon
+        self.match_level = entry.match_level
+        self.match_desc = entry.match_desc
+
+
+class ResultRecord:
+    """Distance result for one site"""
+    __slots__ = ('address', 'suburb', 'state', 'distance', 'duration', 'status', 'tag',
+                 'match_level', 'lat', 'lon', 'estimated')
+    
+    def __init__(self, site, distance, duration, status, tag, match_level, estimated=False):
+        self.address = site.address
+        self.suburb = site.suburb
+        self.state = site.state
+        self.distance = distance
+        self.duration = duration
+        self.status = sys.intern(status)
+        self.tag = tag
+        self.match_level = match_level
+        self.lat = site.lat
+        self.lon = site.lon
+        self.estimated = estimated
+
+
+# Result tags in the order used for the store's tag codes
+RESULT_TAGS = ('success', 'cached', 'warning', 'error')
+
+# Store column sorted by each results table header (Rank sorts by distance)
+RESULT_SORT_COLUMNS = ['distance', 'address', 'suburb', 'state', 'distance', 'duration', 'match_level']
+
+
+class ResultStore:
+    """Columnar result storage - NumPy arrays for numeric columns, lists for text
+    
+    Text columns are sorted through cached integer codes so a multi-key sort is a
+    single stable np.lexsort over integer and float arrays.
+    """
+    TEXT_COLUMNS = ('address', 'suburb', 'state', 'status')
+    
+    def __init__(self, records=()):
+        import numpy as np
+        
+        records = list(records)
+        self.address = [r.address for r in records]
+        self.suburb = [r.suburb for r in records]
+        self.state = [r.state for r in records]
+        self.status = [r.status for r in records]
+        self.tag = np.array([RESULT_TAGS.index(r.tag) for r in records], dtype=np.int8)
+        self.distance = np.array([r.distance for r in records], dtype=np.float64)
+        self.duration = np.array([r.duration for r in records], dtype=np.float64)
+        self.match_level = np.array([r.match_level for r in records], dtype=np.int32)
+        self.lat = np.array([np.nan if r.lat is None else r.lat for r in records], dtype=np.float64)
+        self.lon = np.array([np.nan if r.lon is None else r.lon for r in records], dtype=np.float64)
+        self.estimated = np.array([r.estimated for r in records], dtype=bool)
+        
+        self._codes = {}
+        self.sort_keys = []
+        self.order = np.arange(len(records))
+        self.sort([('distance', False)])
+    
+    def __len__(self):
+        return len(self.address)
+    
+    def merged(self, records):
+        """Store for records that carries over this store's rows for unchanged records
+        
+        Only new or changed records are converted; kept rows are copied as array
+        slices, rows without a record are dropped and the current sort is kept.
+        """
+        import numpy as np
+        
+        rows = {row: i for i, row in enumerate(zip(self.address, self.suburb, self.state, self.status,
+                                                   self.distance.tolist(), self.duration.tolist()))}
+        keep = []
+        added = []
+        for r in records:
+            i = rows.pop((r.address, r.suburb, r.state, r.status, r.distance, r.duration), None)
+            if i is None:
+                added.append(r)
+            else:
+                keep.append(i)
+        
+        keep = np.array(keep, dtype=np.int64)
+        new = ResultStore(added)
+        store = ResultStore()
+        for column in self.TEXT_COLUMNS:
+            old = getattr(self, column)
+            setattr(store, column, [old[i] for i in keep] + getattr(new, column))
+        for column in ('tag', 'distance', 'duration', 'match_level', 'lat', 'lon', 'estimated'):
+            setattr(store, column, np.concatenate([getattr(self, column)[keep], getattr(new, column)]))
+        store.sort(self.sort_keys)
+        return store
+    
+    def codes(self, column):
+        """Integer codes for a text column, ordered case-insensitively"""
+        import numpy as np
+        
+        if column not in self._codes:
+            values = getattr(self, column)
+            uniques = sorted(set(values), key=lambda v: (v.casefold(), v))
+            lookup = {value: code for code, value in enumerate(uniques)}
+            self._codes[column] = np.array([lookup[v] for v in values], dtype=np.int32)
+        return self._codes[column]
+    
+    def sort(self, keys):
+        """Stable multi-key sort - keys is a list of (column, descending), primary first"""
+        import numpy as np
+        
+        lex_keys = []
+        for column, descending in keys:
+            if column in self.TEXT_COLUMNS:
+                values = self.codes(column)
+                lex_keys.append(-values if descending else values)
+            else:
+                values = getattr(self, column)
+                finite = np.isfinite(values)
+                # Unresolved rows (inf distance) always sort last
+                lex_keys.append(~finite)
+                lex_keys.append(np.where(finite, -values if descending else values, 0))
+        
+        if lex_keys:
+            # np.lexsort treats the last key as primary
+            self.order = np.lexsort(lex_keys[::-1])
+        else:
+            self.order = np.arange(len(self))
+        self.sort_keys = list(keys)
+    
+    def view(self, tags):
+        """Row indices in the current sort order, restricted to the given tags"""
+        import numpy as np
+        
+        codes = [RESULT_TAGS.index(tag) for tag in tags]
+        return self.order[np.isin(self.tag[self.order], codes)]
+    
+    def distance_ranks(self, rows):
+        """1-based distance rank of each row among the given rows"""
+        import numpy as np
+        
+        ranks = np.empty(len(rows), dtype=np.int64)
+        ranks[np.lexsort((rows, self.distance[rows]))] = np.arange(1, len(rows) + 1)
+        return ranks
+    
+    def tag_counts(self):
+        """Number of results per tag"""
+        import numpy as np
+        
+        counts = np.bincount(self.tag, minlength=len(RESULT_TAGS))
+        return {tag: int(count) for tag, count in zip(RESULT_TAGS, counts)}
+
+
+class EmptyResultStore:
+    """Stand-in for a ResultStore until the first results arrive, so the window opens without NumPy"""
+    sort_keys = [('distance', False)]
+    
+    def __len__(self):
+        return 0
+    
+    def tag_counts(self):
+        return {tag: 0 for tag in RESULT_TAGS}
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `rate` start per second (0 means unlimited)"""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+    
+    def wait(self):
+        """Block until the caller may issue its request"""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SharedRateLimiter(RateLimiter):
+    """RateLimiter whose schedule is shared by every process holding it
+    
+    Pass one instance to worker processes (e.g. via a pool initializer) so a
+    provider's request rate stays within its limit across the whole pool.
+    """
+    
+    def __init__(self, rate):
+        import multiprocessing
+        
+        super().__init__(rate)
+        self.shared_slot = multiprocessing.Value('d', 0.0)
+    
+    def wait(self):
+        """Block until the caller may issue its request"""
+        if not self.interval:
+            return
+        with self.shared_slot.get_lock():
+            now = time.monotonic()
+            slot = max(now, self.shared_slot.value)
+            self.shared_slot.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one call with a shared result
+    
+    The first caller for a key runs the function; callers arriving while it is in
+    flight wait for it and receive the same result (or exception).
+    """
+    
+    class _Call:
+        __slots__ = ('done', 'result', 'error')
+        
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.calls = 0
+        self.collapsed = 0
+    
+    def do(self, key, fn):
+        """Run fn() for key, or wait for the identical call already in flight"""
+        with self.lock:
+            call = self.in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self.in_flight[key] = self._Call()
+                self.calls += 1
+            else:
+                self.collapsed += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            call.done.set()
+    
+    def add_collapsed(self, count):
+        """Count duplicates that were merged before reaching do()"""
+        with self.lock:
+            self.collapsed += count
+    
+    def counters(self):
+        with self.lock:
+            return self.calls, self.collapsed
+
+
+class RequestBatcher:
+    """Coalesces work submitted by concurrent callers into batched calls
+    
+    The first submission opens a short collection window; everything submitted
+    before it closes (or until max_items) goes to one process(items) call, which
+    returns {item: result}. Identical items from different callers are processed
+    once, so items must be hashable.
+    """
+    
+    class _Batch:
+        __slots__ = ('items', 'done', 'results', 'error')
+        
+        def __init__(self):
+            self.items = {}
+            self.done = threading.Event()
+            self.results = {}
+            self.error = None
+    
+    def __init__(self, process, window=0.02, max_items=1000):
+        self.process = process
+        self.window = window
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.current = None
+        self.batches = 0
+        self.submitted = 0
+        self.processed = 0
+    
+    def submit(self, items):
+        """Add items to the next batch, wait for it and return their results in order"""
+        items = list(items)
+        if not items:
+            return []
+        
+        with self.lock:
+            batch = self.current
+            if batch is None:
+                batch = self.current = self._Batch()
+                timer = threading.Timer(self.window, self.flush, (batch,))
+                timer.daemon = True
+                timer.start()
+            batch.items.update(dict.fromkeys(items))
+            self.submitted += len(items)
+            full = len(batch.items) >= self.max_items
+        
+        if full:
+            self.flush(batch)
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return [batch.results.get(item) for item in items]
+    
+    def flush(self, batch):
+        """Close a batch and process it - a batch that was already flushed is ignored"""
+        with self.lock:
+            if self.current is not batch:
+                return
+            self.current = None
+            self.batches += 1
+            self.processed += len(batch.items)
+        
+        try:
+            batch.results = self.process(list(batch.items))
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+    
+    def counters(self):
+        """(batches run, items submitted, unique items processed)"""
+        with self.lock:
+            return self.batches, self.submitted, self.processed
+
+
+class AdaptiveLimit:
+    """AIMD control of a provider's concurrency and request rate
+    
+    Each success raises the concurrency limit by 1/limit (about one per round of
+    requests) and the rate by a small step, up to their ceilings. Overload - a
+    429/503, a timeout, or latency far above the best seen - halves both, at most
+    once per cooldown, and pauses all requests for the Retry-After time.
+    """
+    LATENCY_FACTOR = 3.0
+    MIN_RATE = 0.1
+    
+    def __init__(self, concurrency, max_concurrency, rate, max_rate):
+        self.limit = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.max_rate = max_rate
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency = None
+        self.best_latency = None
+        self.overloads = 0
+        self.cond = threading.Condition()
+    
+    @property
+    def interval(self):
+        """Current minimum spacing between requests (0 means unlimited)"""
+        return 1.0 / self.rate if self.rate else 0.0
+    
+    def __enter__(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+            delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return self
+    
+    def __exit__(self, *exc):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify()
+    
+    def succeeded(self, latency):
+        """Record a successful request and its latency in seconds"""
+        with self.cond:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+            
+            # Queueing at the backend shows up as latency well above the best seen
+            if self.latency > self.LATENCY_FACTOR * max(self.best_latency, 0.02):
+                self.decrease()
+                return
+            
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            if self.rate:
+                self.rate = min(self.max_rate, self.rate + 0.05 * self.max_rate)
+            self.cond.notify_all()
+    
+    def overloaded(self, retry_after):
+        """Record a rejected or timed-out request and pause for retry_after seconds"""
+        with self.cond:
+            self.overloads += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.decrease()
+    
+    def decrease(self):
+        """Halve the concurrency limit and rate - call with the lock held"""
+        now = time.monotonic()
+        if now - self.last_decrease < max(1.0, self.latency or 0.0):
+            return
+        self.last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+        if self.rate:
+            self.rate = max(self.MIN_RATE, self.rate / 2)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Stops calling a backend that keeps failing
+    
+    After `threshold` consecutive failures the circuit opens and calls fail
+    immediately. Once `reset_after` seconds have passed a single probe call is let
+    through: success closes the circuit, failure keeps it open for another period.
+    """
+    
+    def __init__(self, threshold=5, reset_after=30.0, name="Backend", fallback="using estimates"):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.name = name
+        self.fallback = fallback
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+        self.lock = threading.Lock()
+    
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+    
+    def allow(self):
+        """Whether a call may go out now (claims the probe when one is due)"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_after:
+                self.probing = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                print(f"✓ {self.name} recovered, circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                if self.opened_at is None:
+                    self.trips += 1
+                    print(f"⚠ {self.name} failing, circuit open - {self.fallback} for {self.reset_after:.0f}s")
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+
+def parse_retry_after(value, default):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RequestCancelled(Exception):
+    """Raised instead of sending a request for a job that has been cancelled"""
+
+
+# Stop check for provider requests made by the current thread, set by cancellable()
+_request_context = threading.local()
+
+
+def cancellable(fn, should_stop):
+    """Wrap fn so the provider requests it makes give up once should_stop() is true"""
+    if should_stop is None:
+        return fn
+    
+    def run(*args):
+        _request_context.should_stop = should_stop
+        try:
+            return fn(*args)
+        finally:
+            _request_context.should_stop = None
+    return run
+
+
+def iter_completed(pool, fn, items, should_stop=None, poll=0.1):
+    """Run fn over items in a thread pool, yielding (item, result) as each call finishes
+    
+    Once should_stop() is true, calls that have not started are cancelled and
+    the loop ends within `poll` seconds. Requests already on the wire are
+    abandoned; their threads give up before the next retry.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+    
+    fn = cancellable(fn, should_stop)
+    futures = {pool.submit(fn, item): item for item in items}
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield futures[future], future.result()
+        if should_stop and should_stop():
+            for future in pending:
+                future.cancel()
+            return
+
+
+@contextmanager
+def task_pool(max_workers, should_stop=None):
+    """Thread pool that is not waited for on exit once should_stop() is true"""
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=not (should_stop and should_stop()), cancel_futures=True)
+
+
+class Endpoint:
+    """One replica of a provider's service, with its own circuit breaker and load"""
+    
+    def __init__(self, url, breaker):
+        self.url = url
+        self.breaker = breaker
+        self.in_flight = 0
+        self.latency = None
+
+
+class HedgedRequest:
+    """State shared by a request and its hedge: replicas tried, and whether it went out or was answered"""
+    
+    def __init__(self):
+        self.tried = []
+        self.sent = threading.Event()
+        self.answered = threading.Event()
+
+
+def percentile(samples, p):
+    """p-th percentile (0-100) of a sequence of numbers by nearest rank, or None if empty"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Provider:
+    """Base class for HTTP geocoding and routing backends
+    
+    Settings (all overridable from the config file):
+        base_url        - service root, e.g. a self-hosted instance, or a list of
+                          replicas that requests are balanced and hedged across
+        hedge_percentile - with replicas, latency percentile of recent requests after
+                          which a duplicate goes to another replica (0 disables)
+        rate_limit      - max requests per second to start at, 0 for unlimited
+        concurrency     - max requests in flight at once to start at, per replica
+        max_rate_limit  - ceiling the rate may climb to (default: rate_limit)
+        max_concurrency - ceiling the concurrency may climb to (default: concurrency), per replica
+        max_retries     - retries of a request rejected with 429/503 or timed out
+        breaker_threshold - consecutive failures before the circuit breaker opens
+        breaker_reset   - seconds before an open circuit lets a probe request through
+        batch_size      - coordinates per table request (routers) or queries per wave (geocoders)
+        timeout         - per-request timeout in seconds
+    """
+    DEFAULTS = {
+        'base_url': '',
+        'user_agent': 'AddressDistanceCalculator/3.0',
+        'rate_limit': 1.0,
+        'concurrency': 1,
+        'max_rate_limit': None,
+        'max_concurrency': None,
+        'max_retries': 3,
+        'breaker_threshold': 5,
+        'breaker_reset': 30,
+        'batch_size': 1,
+        'timeout': 10,
+        'hedge_percentile': 95
+    }
+    
+    # Responses meaning "slow down" rather than "this request is wrong"
+    OVERLOAD_STATUSES = (429, 503)
+    
+    # Request latencies kept for the hedge threshold and the p99 statistics
+    LATENCY_WINDOW = 1000
+    
+    # Requests seen before hedging starts, so the threshold is a real percentile
+    HEDGE_MIN_SAMPLES = 20
+    
+    def __init__(self, **settings):
+        self.settings = {**self.DEFAULTS, **settings}
+        urls = self.settings['base_url']
+        urls = [url.rstrip('/') for url in ([urls] if isinstance(urls, str) else urls)]
+        self.base_url = urls[0]
+        # Concurrency settings are per replica, so a pool's limit grows with its size
+        start_concurrency = max(1, int(self.settings['concurrency'])) * len(urls)
+        self.concurrency = max(start_concurrency, int(self.settings['max_concurrency'] or 0) * len(urls))
+        self.batch_size = max(1, int(self.settings['batch_size']))
+        self.timeout = self.settings['timeout']
+        self.max_retries = max(0, int(self.settings['max_retries']))
+        
+        rate = self.settings['rate_limit'] or 0
+        max_rate = max(rate, self.settings['max_rate_limit'] or 0) if rate else 0
+        self.control = AdaptiveLimit(start_concurrency, self.concurrency, rate, max_rate)
+        self.rate_limiter = RateLimiter(rate)
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+        self.breaker = CircuitBreaker(int(self.settings['breaker_threshold']), float(self.settings['breaker_reset']))
+        self.single_flight = SingleFlight()
+        self._session = None
+        
+        # A single endpoint shares the provider's breaker; replicas each get their own
+        if len(urls) == 1:
+            self.endpoints = [Endpoint(urls[0], self.breaker)]
+        else:
+            self.endpoints = [
+                Endpoint(url, CircuitBreaker(int(self.settings['breaker_threshold']),
+                                             float(self.settings['breaker_reset']),
+                                             f"Replica {url}", "using the other replicas"))
+                for url in urls
+            ]
+        self.endpoint_lock = threading.Lock()
+        self.hedge_percentile = float(self.settings['hedge_percentile'] or 0)
+        self._hedge_pool = None
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.response_latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.primary_latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.hedge_counts = [0, 0, 0]  # requests, hedges sent, hedges that answered first
+    
+    def shared_limits(self):
+        """Rate limiter and concurrency slots that can be shared with worker processes"""
+        import multiprocessing
+        
+        return SharedRateLimiter(self.settings['rate_limit']), multiprocessing.BoundedSemaphore(self.concurrency)
+    
+    def use_limits(self, limits):
+        """Adopt limits from shared_limits(), e.g. inside a worker process"""
+        self.rate_limiter, self.slots = limits
+    
+    @property
+    def session(self):
+        """Shared HTTP session (keep-alive), created on first use"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers['User-Agent'] = self.settings['user_agent']
+        return self._session
+    
+    @property
+    def hedge_pool(self):
+        """Threads for primary and hedge requests to replicas, created on first use"""
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=2 * self.concurrency + 2)
+        return self._hedge_pool
+    
+    def choose_endpoint(self, tried=()):
+        """Least-loaded replica not yet tried whose breaker lets a request through, or None"""
+        if len(self.endpoints) == 1:
+            return None if tried else self.endpoints[0]
+        with self.endpoint_lock:
+            candidates = sorted(
+                (e for e in self.endpoints if e not in tried),
+                key=lambda e: (e.in_flight, e.latency or 0.0)
+            )
+        for endpoint in candidates:
+            if endpoint.breaker.allow():
+                return endpoint
+        return None
+    
+    def hedge_delay(self):
+        """Seconds to wait before hedging a request, or None when hedging is off"""
+        if len(self.endpoints) == 1 or not self.hedge_percentile or len(self.latencies) < self.HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(self.latencies, self.hedge_percentile)
+    
+    def get_json(self, path, params=None):
+        """GET a JSON document within the provider's adaptive limits and circuit breaker
+        
+        Raises CircuitOpenError without calling the backend while the breaker is open.
+        Unreachable servers, 5xx responses and read timeouts count as failures, each
+        charged once. With replicas they count against that replica's breaker, and
+        the provider's breaker opens only when every replica's breaker is open.
+        The request goes to the least-loaded healthy replica, fails over to the
+        others, and is hedged to a second replica once it runs longer than the
+        hedge_percentile of recent requests; the first response wins.
+        """
+        import requests
+        
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.base_url} is unavailable")
+        
+        try:
+            if len(self.endpoints) == 1:
+                data = self.request_json(self.endpoints[0], path, params)
+            else:
+                data = self.hedged_json(path, params)
+        except CircuitOpenError:
+            # Every replica's breaker is open
+            self.breaker.record_failure()
+            raise
+        except requests.RequestException as e:
+            # Replica errors were charged to their own breakers by fetch_json
+            if len(self.endpoints) == 1:
+                self.record_error(self.breaker, e)
+            raise
+        
+        self.breaker.record_success()
+        return data
+    
+    def record_error(self, breaker, error):
+        """Charge a failed request to a breaker - returns whether the server was at fault
+        
+        Client errors (4xx other than overload) show the server is up. Read timeouts
+        are not charged here: request_json records every one as it happens.
+        """
+        import requests
+        
+        if isinstance(error, requests.HTTPError):
+            status = error.response.status_code if error.response is not None else 500
+            if status < 500 and status not in self.OVERLOAD_STATUSES:
+                breaker.record_success()
+                return False
+            breaker.record_failure()
+        elif isinstance(error, requests.ConnectionError):
+            breaker.record_failure()
+        return True
+    
+    def hedged_json(self, path, params):
+        """GET from one replica, sending a duplicate to another if it is slow - first answer wins"""
+        from concurrent.futures import wait, FIRST_COMPLETED
+        
+        start = time.monotonic()
+        request = HedgedRequest()
+        fetch = cancellable(self.fetch_json, getattr(_request_context, 'should_stop', None))
+        primary = self.hedge_pool.submit(fetch, path, params, request)
+        primary.add_done_callback(lambda f: (self.primary_latencies.append(time.monotonic() - start),
+                                             request.sent.set()))
+        futures = {primary}
+        
+        delay = self.hedge_delay()
+        if delay is not None:
+            # Time from when the request goes out: waiting for the concurrency limit is not slowness
+            request.sent.wait()
+            done, _ = wait(futures, timeout=delay)
+            # Checked without claiming a probe, which the hedge itself may need
+            if not done and any(e not in request.tried and not e.breaker.is_open for e in self.endpoints):
+                futures.add(self.hedge_pool.submit(fetch, path, params, request, True))
+        
+        with self.endpoint_lock:
+            self.hedge_counts[0] += 1
+            self.hedge_counts[1] += len(futures) - 1
+        
+        error = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    data = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                request.answered.set()
+                self.response_latencies.append(time.monotonic() - start)
+                if future is not primary:
+                    with self.endpoint_lock:
+                        self.hedge_counts[2] += 1
+                return data
+        raise error
+    
+    def fetch_json(self, path, params, request, hedge=False):
+        """GET from the least-loaded healthy replica the request has not tried, failing over to the rest
+        
+        The HedgedRequest is shared with the hedge so the two use different
+        replicas. Hedges bypass the concurrency limits: they are rare by design,
+        and one queued behind a full limit would not arrive early.
+        """
+        import requests
+        
+        error = None
+        while True:
+            endpoint = self.choose_endpoint(request.tried)
+            if endpoint is None:
+                raise error or CircuitOpenError(f"No {self.base_url} replica available")
+            request.tried.append(endpoint)
+            try:
+                data = self.request_json(endpoint, path, params, request, hedge)
+            except (requests.HTTPError, requests.ConnectionError, requests.Timeout) as e:
+                if not self.record_error(endpoint.breaker, e):
+                    raise
+                error = e
+                continue
+            endpoint.breaker.record_success()
+            return data
+    
+    def hedge_stats(self):
+        """Hedged request counts and p99 latency with and without hedging (ms)"""
+        requests, hedged, wins = self.hedge_counts
+        p99 = percentile(self.response_latencies, 99)
+        unhedged_p99 = percentile(self.primary_latencies, 99)
+        return {
+            'requests': requests,
+            'hedged': hedged,
+            'hedge_wins': wins,
+            'overhead': hedged / requests if requests else 0.0,
+            'p99_ms': None if p99 is None else round(p99 * 1000, 1),
+            'unhedged_p99_ms': None if unhedged_p99 is None else round(unhedged_p99 * 1000, 1),
+        }
+    
+    def request_json(self, endpoint, path, params=None, request=None, hedge=False):
+        """GET a JSON document from an endpoint within the provider's adaptive concurrency and rate limits
+        
+        Overload responses (429/503) and read timeouts slow the provider down and are
+        retried after Retry-After or an exponential backoff, up to max_retries times.
+        An unreachable server fails at once, after a short connect timeout. Requests
+        made for a cancelled job raise RequestCancelled instead of going out.
+        """
+        import requests
+        
+        url = endpoint.url + path
+        timeout = (min(self.timeout, 5), self.timeout)
+        for attempt in range(self.max_retries + 1):
+            should_stop = getattr(_request_context, 'should_stop', None)
+            if should_stop and should_stop():
+                raise RequestCancelled(url)
+            backoff = min(30.0, 0.5 * 2 ** attempt)
+            with (nullcontext() if hedge else self.slots), (nullcontext() if hedge else self.control):
+                self.rate_limiter.interval = self.control.interval
+                self.rate_limiter.wait()
+                with self.endpoint_lock:
+                    endpoint.in_flight += 1
+                if request:
+                    request.sent.set()
+                start = time.monotonic()
+                try:
+                    response = self.session.get(url, params=params, timeout=timeout)
+                except requests.ConnectTimeout:
+                    raise
+                except requests.Timeout:
+                    # A hung backend should trip the breaker, not be retried indefinitely.
+                    # Every read timeout is charged here, so callers do not charge it again
+                    endpoint.breaker.record_failure()
+                    if attempt == self.max_retries or endpoint.breaker.is_open:
+                        raise
+                    self.control.overloaded(backoff)
+                    continue
+                finally:
+                    with self.endpoint_lock:
+                        endpoint.in_flight -= 1
+            
+            if response.status_code in self.OVERLOAD_STATUSES and attempt < self.max_retries:
+                self.control.overloaded(parse_retry_after(response.headers.get('Retry-After'), backoff))
+                continue
+            
+            response.raise_for_status()
+            latency = time.monotonic() - start
+            # A slow request its hedge already answered is a replica's tail, not overload
+            if not (request and request.answered.is_set()):
+                self.control.succeeded(latency)
+            self.latencies.append(latency)
+            endpoint.latency = latency if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * latency
+            return response.json()
+
+
+class NominatimGeocoder(Provider):
+    """Nominatim search API (public OSM server by default)"""
+    DEFAULTS = {
+        **Provider.DEFAULTS,
+        'base_url': 'https://nominatim.openstreetmap.org',
+        'country_codes': 'au'
+    }
+    
+    def search(self, query):
+        """Return (lat, lon) of the best match for a free-form query, or None"""
+        params = {
+            'q': query,
+            'format': 'json',
+            'limit': 3,
+            'addressdetails': 1
+        }
+        if self.settings['country_codes']:
+            params['countrycodes'] = self.settings['country_codes']
+        
+        data = self.get_json("/search", params)
+        if data:
+            return float(data[0]['lat']), float(data[0]['lon'])
+        return None
+
+
+class PhotonGeocoder(Provider):
+    """Photon geocoder (komoot), typically self-hosted"""
+    DEFAULTS = {
+        **Provider.DEFAULTS,
+        'base_url': 'https://photon.komoot.io',
+        'bbox': '112.9,-43.7,153.7,-10.6'  # Australia
+    }
+    
+    def search(self, query):
+        """Return (lat, lon) of the best match for a free-form query, or None"""
+        params = {'q': query, 'limit': 1}
+        if self.settings['bbox']:
+            params['bbox'] = self.settings['bbox']
+        
+        data = self.get_json("/api", params)
+        if data.get('features'):
+            lon, lat = data['features'][0]['geometry']['coordinates']
+            return float(lat), float(lon)
+        return None
+
+
+class OSRMRouter(Provider):
+    """OSRM routing engine (public demo server by default)"""
+    DEFAULTS = {
+        **Provider.DEFAULTS,
+        'base_url': 'http://router.project-osrm.org',
+        'profile': 'driving',
+        'batch_size': 50
+    }
+    
+    def route(self, origin, destination):
+        """Road (distance_km, duration_min) between two (lat, lon) points, or None"""
+        coords = f"{origin[1]},{origin[0]};{destination[1]},{destination[0]}"
+        data = self.get_json(f"/route/v1/{self.settings['profile']}/{coords}", {'overview': 'false', 'steps': 'false'})
+        
+        if data['code'] == 'Ok' and data['routes']:
+            route = data['routes'][0]
+            return route['distance'] / 1000, route['duration'] / 60
+        return None
+    
+    def table(self, origin, destinations):
+        """Road (distance_km, duration_min) from origin to each destination in one request
+        
+        Entries are None where OSRM found no route. Callers split destinations into
+        chunks of batch_size.
+        """
+        return self.matrix([origin], destinations)[0]
+    
+    def matrix(self, sources, destinations):
+        """Road (distance_km, duration_min) from each source to each destination in one request
+        
+        Returns one row per source; entries are None where OSRM found no route.
+        """
+        points = list(sources) + list(destinations)
+        coords = ';'.join(f"{lon},{lat}" for lat, lon in points)
+        data = self.get_json(f"/table/v1/{self.settings['profile']}/{coords}", {
+            'sources': ';'.join(str(i) for i in range(len(sources))),
+            'destinations': ';'.join(str(i) for i in range(len(sources), len(points))),
+            'annotations': 'distance,duration'
+        })
+        
+        if data['code'] != 'Ok':
+            raise ValueError(f"OSRM table returned {data['code']}")
+        
+        results = []
+        for distances, durations in zip(data['distances'], data['durations']):
+            results.append([
+                None if distance is None or duration is None else (distance / 1000, duration / 60)
+                for distance, duration in zip(distances, durations)
+            ])
+        return results
+
+
+GEOCODER_TYPES = {'nominatim': NominatimGeocoder, 'photon': PhotonGeocoder}
+ROUTER_TYPES = {'osrm': OSRMRouter}
+
+
+def load_config():
+    """Read the optional settings file - missing or invalid files give defaults"""
+    try:
+        if CONFIG_FILE.exists():
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"⚠ Error loading config: {e}")
+    return {}
+
+
+def create_geocode_cache(config):
+    """Empty geocode cache with the size caps and eviction policy from the config"""
+    return GeocodeCache(
+        max_entries=int(config.get('cache_max_entries', CACHE_MAX_ENTRIES)),
+        max_bytes=int(float(config.get('cache_max_mb', CACHE_MAX_MB)) * 1024 * 1024),
+        policy=config.get('cache_eviction', 'lru')
+    )
+
+
+def create_provider(settings, types, default_type):
+    """Instantiate a provider from its config section, e.g. {'type': 'osrm', ...}"""
+    settings = dict(settings or {})
+    provider_type = settings.pop('type', default_type)
+    if provider_type not in types:
+        print(f"⚠ Unknown provider type '{provider_type}', using {default_type}")
+        provider_type = default_type
+    return types[provider_type](**settings)
+
+
+# Street prefixes dropped by the "without shop/unit" cascade attempt and canonical keys,
+# including the "3/12 Smith St" unit/number form
+UNIT_PREFIX_PATTERN = re.compile(
+    r'^(?:(?:Shop|Unit|Suite|Level|T/a|Tenancy|Lot)\s*\d+[A-Za-z]?|\d+[A-Za-z]?(?=\s*/))\s*[,/]?\s*',
+    re.IGNORECASE
+)
+
+# Street types folded to their standard abbreviations in canonical keys
+STREET_TYPE_ABBREVIATIONS = {
+    'street': 'st', 'road': 'rd', 'avenue': 'ave', 'av': 'ave', 'drive': 'dr', 'place': 'pl',
+    'court': 'ct', 'crescent': 'cres', 'parade': 'pde', 'highway': 'hwy', 'lane': 'ln',
+    'terrace': 'tce', 'boulevard': 'bvd', 'boulevarde': 'bvd', 'close': 'cl', 'circuit': 'cct',
+    'esplanade': 'esp', 'grove': 'gr', 'square': 'sq', 'parkway': 'pkwy', 'freeway': 'fwy',
+    'promenade': 'prom', 'arcade': 'arc', 'circle': 'cir', 'track': 'trk', 'ridge': 'rdge'
+}
+
+STATE_ABBREVIATIONS = {
+    'new south wales': 'nsw', 'victoria': 'vic', 'queensland': 'qld', 'south australia': 'sa',
+    'western australia': 'wa', 'tasmania': 'tas', 'northern territory': 'nt',
+    'australian capital territory': 'act'
+}
+
+# Punctuation folded to spaces in canonical keys (hyphens and slashes carry meaning)
+ADDRESS_FOLD_PATTERN = re.compile(r"[^\w/-]+")
+
+
+def fold_words(text):
+    """Lower-case words of an address field with punctuation and repeated spaces folded"""
+    text = text.lower().replace("'", '').replace('.', '')
+    return [w for w in ADDRESS_FOLD_PATTERN.sub(' ', text).split() if w.strip('-/')]
+
+
+def canonical_address(address, suburb, state):
+    """Canonical cache key for an address - variants of one site share a key
+    
+    Drops shop/unit/level prefixes (as the cascade does), folds case, punctuation and
+    whitespace, abbreviates street types, strips postcodes from the suburb and
+    state and abbreviates state names: "Shop 3/12 Smith Street, Sydney, NSW 2000"
+    and "12 smith st, SYDNEY, New South Wales" both become "12 smith st, sydney, nsw".
+    """
+    address = address.strip()
+    unit = UNIT_PREFIX_PATTERN.match(address)
+    # Lot numbers are separate properties, not units of one building
+    if unit and not unit.group(0).lower().startswith('lot'):
+        address = address[unit.end():]
+    street = [STREET_TYPE_ABBREVIATIONS.get(w, w) for w in fold_words(address)]
+    suburb = fold_words(suburb)
+    state = fold_words(state)
+    while suburb and len(suburb) > 1 and suburb[-1].isdigit():
+        suburb.pop()
+    while state and state[-1].isdigit():
+        state.pop()
+    state = ' '.join(state)
+    return f"{' '.join(street)}, {' '.join(suburb)}, {STATE_ABBREVIATIONS.get(state, state)}"
+
+
+def canonical_key(key):
+    """Canonical form of a stored 'address, suburb, state' cache key"""
+    parts = key.rsplit(',', 2)
+    return canonical_address(*parts) if len(parts) == 3 else key
+
+
+def cascade_queries(address):
+    """Incrementally broader search attempts for an address as (query, level, description)"""
+    parts = [p.strip() for p in address.split(',')]
+    search_attempts = []
+    
+    # Attempt 1: Full address
+    search_attempts.append((address, 0, 'exact address'))
+    
+    # Attempt 2: Remove shop/unit numbers
+    if len(parts) >= 3:
+        street_part = parts[0]
+        cleaned_street = UNIT_PREFIX_PATTERN.sub('', street_part)
+        
+        if cleaned_street != street_part and cleaned_street.strip():
+            search_attempts.append((', '.join([cleaned_street] + parts[1:]), 1, 'without shop/unit'))
+    
+    # Attempt 3: Suburb + State only
+    if len(parts) >= 2:
+        search_attempts.append((f"{parts[-2]}, {parts[-1]}", 3, 'suburb and state'))
+    
+    return search_attempts
+
+
+class GeocodeCascade:
+    """Runs the geocoding fallback cascade for a whole batch of addresses at once
+    
+    Addresses advance through their attempts in rounds. Each round issues every
+    distinct query once (in parallel, up to the geocoder's concurrency), so a
+    "suburb, state" query shared by many sites is sent a single time. Found
+    locations are kept per query string for the duration of one resolve() call;
+    empty answers are never kept, so a retry always asks the geocoder again.
+    """
+    
+    def __init__(self, geocoder):
+        self.geocoder = geocoder
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def query_key(query):
+        return ' '.join(query.lower().split())
+    
+    def search(self, query, found=None):
+        """Look up one query, reusing locations already in found - returns (location, errored)"""
+        key = self.query_key(query)
+        if found is not None:
+            with self.lock:
+                if key in found:
+                    return found[key], False
+        
+        try:
+            location = self.geocoder.single_flight.do(key, lambda: self.geocoder.search(query))
+        except Exception as e:
+            print(f"Geocoding '{query}' failed: {e}")
+            return None, True
+        
+        if location and found is not None:
+            with self.lock:
+                found[key] = location
+        return location, False
+    
+    def resolve(self, addresses, on_result=None, should_stop=None, max_retries=4):
+        """Geocode addresses, returning {address: (lat, lon, level, description) or None}
+        
+        on_result(address, result, errored) is called as each address finishes;
+        errored is True if any attempt failed with a transport error rather than
+        an empty answer.
+        """
+        plans = {address: cascade_queries(address)[:max_retries] for address in dict.fromkeys(addresses)}
+        stage = {address: 0 for address in plans}
+        failures = {}
+        errored = set()
+        results = {}
+        found = {}
+        
+        def finish(address, result):
+            results[address] = result
+            del stage[address]
+            if on_result:
+                on_result(address, result, address in errored)
+        
+        def search(query):
+            return self.search(query, found)
+        
+        with task_pool(self.geocoder.concurrency, should_stop) as pool:
+            while stage:
+                if should_stop and should_stop():
+                    break
+                
+                # Group this round's attempts by query so each is sent once
+                round_queries = {}
+                for address, attempt in list(stage.items()):
+                    if attempt >= len(plans[address]):
+                        finish(address, None)
+                        continue
+                    query = plans[address][attempt][0]
+                    round_queries.setdefault(self.query_key(query), (query, []))[1].append(address)
+                
+                if not round_queries:
+                    break
+                
+                waiting = dict(round_queries.values())
+                for query, (location, failed) in iter_completed(pool, search, list(waiting), should_stop):
+                    for address in waiting[query]:
+                        if failed:
+                            # The provider already retried overloads - give the same query
+                            # one more round before moving on to a broader one
+                            errored.add(address)
+                            failures[address] = failures.get(address, 0) + 1
+                            if failures[address] % 2:
+                                continue
+                        if location:
+                            _, level, description = plans[address][stage[address]]
+                            finish(address, (location[0], location[1], level, description))
+                        else:
+                            stage[address] += 1
+        
+        return results
+
+
+# Average speed assumed for straight-line route estimates before the speed model has data
+FALLBACK_SPEED_KMH = 50
+
+# Largest relative error of a speed model estimate trusted to skip routing a site
+ESTIMATE_MAX_ERROR = 0.15
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def estimate_routes(origins, destinations):
+    """Vectorised straight-line fallback - (distance_km, duration_min) arrays
+    
+    origins and destinations are (lat, lon) arrays that broadcast against each
+    other: one origin against many destinations, or a column of points against a
+    row for a whole matrix. Uses the haversine distance.
+    """
+    import numpy as np
+    
+    a = np.radians(np.asarray(origins, dtype=np.float64))
+    b = np.radians(np.asarray(destinations, dtype=np.float64))
+    h = (np.sin((b[..., 0] - a[..., 0]) / 2) ** 2
+         + np.cos(a[..., 0]) * np.cos(b[..., 0]) * np.sin((b[..., 1] - a[..., 1]) / 2) ** 2)
+    distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+    return distance_km, distance_km / FALLBACK_SPEED_KMH * 60
+
+
+class SpeedModel:
+    """Road detour and pace fitted from routed results, by state, distance band and region
+    
+    Every routed pair adds its detour factor (road km per straight-line km) and
+    pace (minutes per straight-line km) to four buckets: state + distance band +
+    0.5 degree cell of the destination, any state + band + cell, state + band and
+    band alone. A bucket keeps the count, sums and squared sums, so estimates use
+    the mean of the most specific bucket with MIN_SAMPLES routes and report a
+    relative error bound of two standard deviations. Without data the model falls
+    back to a detour of 1 at FALLBACK_SPEED_KMH with an unknown (NaN) error.
+    """
+    BANDS_KM = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+    CELL_DEGREES = 0.5
+    MIN_SAMPLES = 8
+    MIN_KM = 0.5
+    ERROR_SIGMAS = 2
+    # Floor on the reported error, covering rounding in stored routes
+    MIN_ERROR = 0.01
+    
+    def __init__(self):
+        self.buckets = {}
+        # Observations not yet written, merged into the file on save
+        self.pending = {}
+        self.lock = threading.Lock()
+    
+    def __len__(self):
+        """Number of routes the model was fitted from"""
+        return sum(b[0] for key, b in self.buckets.items() if key.startswith('*|') and key.count('|') == 1)
+    
+    @classmethod
+    def bucket_keys(cls, state, band, cell):
+        """Bucket keys for a route, most specific first"""
+        state = (state or '*').upper()
+        cell = f"{cell[0]},{cell[1]}"
+        return [f"{state}|{band}|{cell}", f"*|{band}|{cell}", f"{state}|{band}", f"*|{band}"]
+    
+    @classmethod
+    def locate(cls, straight_km, destinations):
+        """Distance band and region cell arrays for straight-line distances and destinations"""
+        import numpy as np
+        
+        bands = np.searchsorted(cls.BANDS_KM, straight_km)
+        cells = np.floor(np.asarray(destinations, dtype=np.float64) / cls.CELL_DEGREES).astype(np.int64)
+        return bands, cells
+    
+    def observe(self, origins, destinations, states, distances, durations):
+        """Add routed results - origins broadcast against destinations, states may be None"""
+        import numpy as np
+        
+        destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+        straight, _ = estimate_routes(origins, destinations)
+        straight = np.broadcast_to(straight, len(destinations))
+        distances = np.asarray(distances, dtype=np.float64)
+        durations = np.asarray(durations, dtype=np.float64)
+        bands, cells = self.locate(straight, destinations)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            detours = distances / straight
+            paces = durations / straight
+        # Very short hops are dominated by the road network's geometry, not its speed
+        usable = (straight >= self.MIN_KM) & (detours >= 0.9) & (detours <= 5) & (paces > 0)
+        
+        with self.lock:
+            for i in np.flatnonzero(usable):
+                detour, pace = float(detours[i]), float(paces[i])
+                state = states[i] if states is not None else None
+                for key in self.bucket_keys(state, int(bands[i]), cells[i].tolist()):
+                    for bucket in (self.buckets, self.pending):
+                        stats = bucket.setdefault(key, [0, 0.0, 0.0, 0.0, 0.0])
+                        stats[0] += 1
+                        stats[1] += detour
+                        stats[2] += detour * detour
+                        stats[3] += pace
+                        stats[4] += pace * pace
+        return int(usable.sum())
+    
+    def fitted(self, keys):
+        """(detour, pace, relative error) from the first bucket with enough routes, or None"""
+        for key in keys:
+            stats = self.buckets.get(key)
+            if stats and stats[0] >= self.MIN_SAMPLES:
+                n, detour, detour_sq, pace, pace_sq = stats
+                detour, pace = detour / n, pace / n
+                spread = max(max(detour_sq / n - detour * detour, 0.0) ** 0.5 / detour,
+                             max(pace_sq / n - pace * pace, 0.0) ** 0.5 / pace)
+                return detour, pace, max(self.ERROR_SIGMAS * spread, self.MIN_ERROR)
+        return None
+    
+    def estimate(self, origins, destinations, states=None):
+        """Vectorised road estimate - (distance_km, duration_min, relative error) arrays
+        
+        origins and destinations broadcast like estimate_routes. states (one per
+        destination) picks state buckets when given. Points are grouped by bucket,
+        so the cost is one haversine pass plus one lookup per distinct bucket.
+        """
+        import numpy as np
+        
+        straight, _ = estimate_routes(origins, destinations)
+        destinations = np.broadcast_to(np.asarray(destinations, dtype=np.float64), straight.shape + (2,))
+        detour = np.ones(straight.shape)
+        pace = np.full(straight.shape, 60 / FALLBACK_SPEED_KMH)
+        error = np.full(straight.shape, np.nan)
+        if not self.buckets or not straight.size:
+            return straight * detour, straight * pace, error
+        
+        bands, cells = self.locate(straight, destinations)
+        if states is None:
+            state_names, state_codes = np.array(['*']), np.zeros(straight.shape, dtype=np.int64)
+        else:
+            states = np.broadcast_to(np.asarray([s or '*' for s in states]), straight.shape)
+            state_names, state_codes = np.unique(states, return_inverse=True)
+        
+        codes = np.stack([state_codes.reshape(straight.shape), bands, cells[..., 0], cells[..., 1]], axis=-1)
+        groups, inverse = np.unique(codes.reshape(-1, 4), axis=0, return_inverse=True)
+        inverse = inverse.reshape(straight.shape)
+        for g, (state, band, lat_cell, lon_cell) in enumerate(groups.tolist()):
+            fit = self.fitted(self.bucket_keys(str(state_names[state]), band, (lat_cell, lon_cell)))
+            if fit:
+                members = inverse == g
+                detour[members], pace[members], error[members] = fit
+        return straight * detour, straight * pace, error
+    
+    def merge(self, raw):
+        """Add bucket sums from disk to the pending ones"""
+        with self.lock:
+            buckets = {key: list(stats) for key, stats in self.pending.items()}
+            for key, stats in raw.get('buckets', {}).items():
+                current = buckets.setdefault(key, [0, 0.0, 0.0, 0.0, 0.0])
+                for i, value in enumerate(stats):
+                    current[i] += value
+            self.buckets = buckets
+    
+    def load(self, path):
+        """Load the fitted buckets from a JSON file"""
+        with FileLock(path):
+            self.merge(read_json_file(path))
+    
+    def save(self, path, replace=False):
+        """Add this process's observations to the file on disk and write it back atomically
+        
+        With replace, the file is overwritten with this model instead (a refit).
+        """
+        if not (self.pending or replace):
+            return
+        with FileLock(path):
+            if not replace:
+                self.merge(read_json_file(path))
+            with self.lock:
+                write_json_atomic(path, {'buckets': self.buckets, 'updated': time.time()})
+                self.pending = {}
+
+
+def match_status(match_level, match_desc):
+    """Status text and tag for a geocoding match level"""
+    if match_level == 0:
+        return "✓ Found (exact)", 'success'
+    elif match_level <= 2:
+        return f"✓ Found ({match_desc})", 'success'
+    return f"⚠ Broad ({match_desc})", 'warning'
+
+
+class RouteMatrix:
+    """Precomputed depot x site road distances, memory-mapped from disk
+    
+    The matrix is a float32 .npy array of shape (depots, sites, 2) holding
+    distance_km and duration_min, NaN where no route was found. A JSON index next
+    to it lists the depots (address and coordinates) by row and the site cache
+    keys by column. Only the rows and columns a run touches are paged in.
+    """
+    
+    def __init__(self, path=ROUTE_MATRIX_FILE):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix('.json')
+        self.depots = {}
+        self.columns = {}
+        self.values = None
+    
+    def __len__(self):
+        return len(self.columns)
+    
+    @staticmethod
+    def depot_key(coords):
+        """Depot lookup key - coordinates rounded to about a metre"""
+        return round(coords[0], 5), round(coords[1], 5)
+    
+    def load(self):
+        """Memory-map the matrix file - returns False if there is no usable matrix"""
+        import numpy as np
+        
+        if not (self.path.exists() and self.index_path.exists()):
+            return False
+        
+        index = read_json_file(self.index_path)
+        depots = index.get('depots', [])
+        sites = index.get('sites', [])
+        values = np.load(self.path, mmap_mode='r')
+        if values.shape != (len(depots), len(sites), 2):
+            print(f"⚠ Route matrix {self.path} does not match its index, ignoring it")
+            return False
+        
+        self.depots = {self.depot_key((d['lat'], d['lon'])): row for row, d in enumerate(depots)}
+        self.columns = {key: col for col, key in enumerate(sites)}
+        self.values = values
+        return True
+    
+    def depot_row(self, origin):
+        """Matrix row for an origin (lat, lon), or None if it is not a depot"""
+        if self.values is None:
+            return None
+        return self.depots.get(self.depot_key(origin))
+    
+    def lookup(self, row, keys):
+        """(distance_km, duration_min) from a depot to each site key, None where unknown"""
+        import numpy as np
+        
+        cols = np.fromiter((self.columns.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        known = cols >= 0
+        values = np.full((len(keys), 2), np.nan, dtype=np.float32)
+        values[known] = self.values[row, cols[known]]
+        
+        finite = np.isfinite(values).all(axis=1)
+        return [(float(v[0]), float(v[1])) if ok else None for v, ok in zip(values.tolist(), finite)]
+    
+    def save(self, depots, site_keys, values):
+        """Write a new matrix and index atomically
+        
+        depots is a list of (address, lat, lon). The index is written last, and
+        load() rejects a matrix whose shape does not match it.
+        """
+        import numpy as np
+        
+        write_file_atomic(self.path, lambda f: np.save(f, values.astype(np.float32)), 'wb')
+        write_json_atomic(self.index_path, {
+            'depots': [{'address': a, 'lat': lat, 'lon': lon} for a, lat, lon in depots],
+            'sites': list(site_keys),
+            'built': time.time()
+        })
+
+
+def route_cost(durations, tour):
+    """Total cost of visiting nodes in tour order"""
+    return float(durations[tour[:-1], tour[1:]].sum())
+
+
+def nearest_neighbour_tour(durations):
+    """Greedy tour from node 0, always driving to the closest unvisited node"""
+    import numpy as np
+    
+    n = len(durations)
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    tour = [0]
+    for _ in range(n - 1):
+        costs = np.where(visited, np.inf, durations[tour[-1]])
+        nxt = int(np.argmin(costs))
+        visited[nxt] = True
+        tour.append(nxt)
+    return tour
+
+
+def two_opt_move(durations, tour):
+    """Best segment reversal for a tour with fixed ends, or None if nothing improves it
+    
+    Costs may be asymmetric (one-way streets), so the reversed segment is costed
+    in the backward direction. All candidate reversals are scored at once.
+    """
+    import numpy as np
+    
+    t = np.asarray(tour)
+    if len(t) < 4:
+        return None
+    forward = np.concatenate(([0.0], np.cumsum(durations[t[:-1], t[1:]])))
+    backward = np.concatenate(([0.0], np.cumsum(durations[t[1:], t[:-1]])))
+    
+    # Reverse positions i..j, keeping the first and last nodes in place
+    i, j = np.triu_indices(len(t) - 1, k=1)
+    keep = i >= 1
+    i, j = i[keep], j[keep]
+    delta = (durations[t[i - 1], t[j]] + durations[t[i], t[j + 1]] + backward[j] - backward[i]
+             - durations[t[i - 1], t[i]] - durations[t[j], t[j + 1]] - forward[j] + forward[i])
+    best = int(np.argmin(delta))
+    if delta[best] >= -1e-9:
+        return None
+    return int(i[best]), int(j[best])
+
+
+def or_opt_move(durations, tour, max_segment=3):
+    """Best relocation of a run of up to max_segment stops, or None if nothing improves it"""
+    import numpy as np
+    
+    t = np.asarray(tour)
+    a, b = t[:-1], t[1:]
+    edge_cost = durations[a, b]
+    best = None
+    best_delta = -1e-9
+    
+    for length in range(1, max_segment + 1):
+        for i in range(1, len(t) - length):
+            first, last = t[i], t[i + length - 1]
+            before, after = t[i - 1], t[i + length]
+            removed = durations[before, first] + durations[last, after] - durations[before, after]
+            
+            # Insert between any edge outside the segment and its neighbours
+            delta = durations[a, first] + durations[last, b] - edge_cost - removed
+            delta[i - 1:i + length] = np.inf
+            k = int(np.argmin(delta))
+            if delta[k] < best_delta:
+                best_delta = delta[k]
+                best = (i, length, k)
+    return best
+
+
+def plan_route(durations, round_trip=False, time_limit=1.0):
+    """Visiting order for stops 1..n starting from node 0 of a square duration matrix
+    
+    Starts from a nearest-neighbour tour and improves it with 2-opt and Or-opt
+    moves until neither helps or time_limit seconds pass. Returns (order of stop
+    indices, total duration); a round trip includes the drive back to node 0.
+    """
+    import numpy as np
+    
+    n = len(durations)
+    if n <= 1:
+        return [], 0.0
+    
+    # Add an end node: back to the start for a round trip, free otherwise
+    costs = np.zeros((n + 1, n + 1))
+    costs[:n, :n] = np.nan_to_num(durations, nan=1e9, posinf=1e9)
+    if round_trip:
+        costs[:n, n] = costs[:n, 0]
+    np.fill_diagonal(costs, 0.0)
+    
+    tour = nearest_neighbour_tour(costs[:n, :n]) + [n]
+    deadline = time.perf_counter() + time_limit
+    while time.perf_counter() < deadline:
+        move = two_opt_move(costs, tour)
+        if move:
+            i, j = move
+            tour[i:j + 1] = tour[i:j + 1][::-1]
+            continue
+        
+        move = or_opt_move(costs, tour)
+        if not move:
+            break
+        i, length, k = move
+        segment = tour[i:i + length]
+        anchor = tour[k]
+        rest = tour[:i] + tour[i + length:]
+        at = rest.index(anchor) + 1
+        tour = rest[:at] + segment + rest[at:]
+    
+    return tour[1:-1], route_cost(costs, np.asarray(tour))
+
+
+POSTCODE_PATTERN = re.compile(r'^(.*?)[\s,]*\b(\d{4})$')
+
+
+def split_postcode(state, extra=None):
+    """(state, postcode) from a state field like "NSW 2000", or a separate postcode column"""
+    if extra and re.fullmatch(r'\d{4}', extra):
+        return state, extra
+    match = POSTCODE_PATTERN.match(state)
+    if match and match.group(1):
+        return match.group(1), match.group(2)
+    return state, ''
+
+
+def parse_address_line(line):
+    """Parse a single line of address data into a Site, or None"""
+    line = line.strip()
+    if not line:
+        return None
+    
+    # Try tab-separated first (Excel default)
+    if '\t' in line:
+        parts = [p.strip() for p in line.split('\t') if p.strip()]
+        if len(parts) >= 3:
+            state, postcode = split_postcode(parts[2], parts[3] if len(parts) > 3 else None)
+            return Site(parts[0], parts[1], state, postcode=postcode)
+    
+    # Try comma-separated
+    if ',' in line:
+        parts = [p.strip() for p in line.split(',') if p.strip()]
+        if len(parts) >= 4 and re.fullmatch(r'\d{4}', parts[-1]):
+            postcode = parts.pop()
+            return Site(', '.join(parts[:-2]), parts[-2], parts[-1], postcode=postcode)
+        if len(parts) >= 3:
+            state, postcode = split_postcode(parts[-1])
+            return Site(', '.join(parts[:-2]), parts[-2], state, postcode=postcode)
+        elif len(parts) == 2:
+            state, postcode = split_postcode(parts[1])
+            return Site('', parts[0], state, postcode=postcode)
+    
+    # Try pipe-separated
+    if '|' in line:
+        parts = [p.strip() for p in line.split('|') if p.strip()]
+        if len(parts) >= 3:
+            state, postcode = split_postcode(parts[2], parts[3] if len(parts) > 3 else None)
+            return Site(parts[0], parts[1], state, postcode=postcode)
+    
+    # Single line - try to detect full address
+    parts = [p.strip() for p in line.split(',')]
+    if len(parts) >= 2:
+        last_part = parts[-1].strip()
+        state_match = re.match(r'^([A-Z]{2,3})(?:\s+(\d{4}))?$', last_part)
+        if state_match:
+            state = state_match.group(1)
+            suburb = parts[-2] if len(parts) >= 2 else ''
+            address = ', '.join(parts[:-2]) if len(parts) > 2 else ''
+            return Site(address, suburb, state, postcode=state_match.group(2) or '')
+    
+    return None
+
+
+class DistanceEngine:
+    """Headless geocode -> route pipeline shared by the GUI and command-line tools
+    
+    Owns the providers, the geocode and not-found caches and the query cascade.
+    Progress is reported through report(kind, data) with the same message kinds
+    the GUI's result queue uses ('status', 'progress', 'update_row').
+    """
+    # Origins whose last incremental run is remembered
+    MEMO_RUNS = 8
+    
+    def __init__(self, config=None):
+        self.config = load_config() if config is None else config
+        self.geocode_cache = create_geocode_cache(self.config)
+        
+        # Not-found addresses short-circuit until their TTL expires
+        ttl_days = self.config.get('negative_cache_ttl_days', NEGATIVE_CACHE_TTL_DAYS)
+        self.negative_cache = NegativeCache(ttl_days * 86400)
+        
+        # Geocoding and routing backends
+        self.geocoder = create_provider(self.config.get('geocoder'), GEOCODER_TYPES, 'nominatim')
+        self.router = create_provider(self.config.get('router'), ROUTER_TYPES, 'osrm')
+        self.cascade = GeocodeCascade(self.geocoder)
+        
+        # National address file, consulted before any network geocoding
+        self.geocode_store = GeocodeStore(self.config.get('geocode_store_file', GEOCODE_STORE_FILE))
+        
+        # Depot runs answer from the precomputed matrix when one has been built
+        self.route_matrix = RouteMatrix(self.config.get('route_matrix_file', ROUTE_MATRIX_FILE))
+        
+        # Postcode centroids place sites that do not need an exact location
+        self.postcodes = PostcodeIndex(self.config.get('postcode_index_file', POSTCODE_INDEX_FILE))
+        
+        # Estimates for unrouted sites, refined from every routed result
+        self.speed_model = SpeedModel()
+        self.speed_model_file = Path(self.config.get('speed_model_file', SPEED_MODEL_FILE))
+        
+        # Last incremental run per origin: site identity -> result record
+        self.runs = OrderedDict()
+        
+        self.cache_ready = threading.Event()
+    
+    def load_caches(self):
+        """Load the persistent caches - returns the number of geocode entries"""
+        cache = create_geocode_cache(self.config)
+        try:
+            if CACHE_FILE.exists():
+                cache.load(CACHE_FILE)
+                print(f"✓ Loaded {len(cache)} cached addresses from {CACHE_FILE}")
+            else:
+                print("ℹ No cache file found, starting with empty cache")
+        except Exception as e:
+            print(f"⚠ Error loading cache: {e}")
+        
+        try:
+            self.negative_cache.load(NEGATIVE_CACHE_FILE)
+        except Exception as e:
+            print(f"⚠ Error loading not-found cache: {e}")
+        
+        try:
+            if self.geocode_store.load():
+                print(f"✓ Mapped geocode store: {len(self.geocode_store)} addresses")
+        except Exception as e:
+            print(f"⚠ Error loading geocode store: {e}")
+        
+        try:
+            if self.route_matrix.load():
+                print(f"✓ Mapped route matrix: {len(self.route_matrix.depots)} depots x "
+                      f"{len(self.route_matrix)} sites")
+        except Exception as e:
+            print(f"⚠ Error loading route matrix: {e}")
+        
+        try:
+            if self.postcodes.load():
+                print(f"✓ Loaded {len(self.postcodes)} postcode centroids")
+        except Exception as e:
+            print(f"⚠ Error loading postcode index: {e}")
+        
+        try:
+            self.speed_model.load(self.speed_model_file)
+        except Exception as e:
+            print(f"⚠ Error loading speed model: {e}")
+        
+        # Nothing is geocoded before the cache is ready, but keep any entries anyway
+        for key, entry in self.geocode_cache.items():
+            cache.put(key, entry)
+        self.geocode_cache = cache
+        self.cache_ready.set()
+        return len(cache)
+    
+    def save_caches(self, new_only=False):
+        """Save the caches, merging with entries written by other processes
+        
+        With new_only, a file is only rewritten when entries were added to that cache,
+        so access metadata alone does not trigger a save.
+        """
+        if not self.cache_ready.is_set():
+            # Writing now would overwrite the file with a partial cache
+            print("ℹ Cache still loading, skipping save")
+            return
+        
+        try:
+            # Only rewrite the file when entries or access metadata changed
+            if self.geocode_cache.added if new_only else self.geocode_cache.dirty:
+                self.geocode_cache.save(CACHE_FILE)
+                print(f"✓ Saved {len(self.geocode_cache)} addresses to cache")
+        except Exception as e:
+            print(f"⚠ Error saving cache: {e}")
+        
+        try:
+            if self.negative_cache.added or not new_only:
+                self.negative_cache.save(NEGATIVE_CACHE_FILE)
+        except Exception as e:
+            print(f"⚠ Error saving not-found cache: {e}")
+        
+        try:
+            if self.speed_model.pending or not new_only:
+                self.speed_model.save(self.speed_model_file)
+        except Exception as e:
+            print(f"⚠ Error saving speed model: {e}")
+    
+    def stored_location(self, key):
+        """Location for a cache key from the geocode store, or None"""
+        location = self.geocode_store.get(key)
+        return CacheEntry(*location) if location else None
+    
+    def apply_cached(self, site):
+        """Fill in a site from the caches - returns 'cached', 'not_found' or None"""
+        entry = self.geocode_cache.get(site.cache_key)
+        if entry is None:
+            entry = self.stored_location(site.cache_key)
+        if entry is not None:
+            site.apply_location(entry)
+            site.status = 'cached'
+        elif site.cache_key in self.negative_cache:
+            site.status = 'not_found'
+        else:
+            return None
+        return site.status
+    
+    def geocode(self, address, max_retries=4, should_stop=None):
+        """Geocode one address - returns (lat, lon, level, description), all None if not found"""
+        site = parse_address_line(address)
+        entry = self.stored_location(site.cache_key) if site else None
+        if entry:
+            return entry.lat, entry.lon, entry.match_level, entry.match_desc
+        
+        result = self.cascade.resolve([address], should_stop=should_stop, max_retries=max_retries).get(address)
+        return result or (None, None, None, None)
+    
+    def route(self, coord1, coord2):
+        """Road distance and duration between two points, estimated if the router fails"""
+        try:
+            key = ('route', tuple(coord1), tuple(coord2))
+            route = self.router.single_flight.do(key, lambda: self.router.route(coord1, coord2))
+            if route:
+                return route
+        except Exception as e:
+            print(f"OSRM error: {e}")
+        distance_km, duration_min, _ = self.speed_model.estimate(coord1, coord2)
+        return float(distance_km), float(duration_min)
+    
+    def get_routes(self, origin, destinations, progress=None, should_stop=None, states=None):
+        """Route from origin to many destinations using batched table requests
+        
+        Returns (distance_km, duration_min, estimated) per destination. Identical
+        destinations (e.g. sites sharing a suburb centroid) are routed once.
+        Batches run in parallel up to the router's concurrency. Routed results
+        refine the speed model; destinations the router cannot answer - including
+        every batch while its circuit breaker is open - get its estimate in one
+        vectorised pass. states (one per destination) select regional buckets.
+        """
+        origin = tuple(origin)
+        unique = list(dict.fromkeys(tuple(d) for d in destinations))
+        state_of = {}
+        if states is not None:
+            for destination, state in zip(destinations, states):
+                state_of.setdefault(tuple(destination), state)
+        self.router.single_flight.add_collapsed(len(destinations) - len(unique))
+        
+        batch_size = self.router.batch_size
+        batches = [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+        
+        def route_batch(batch):
+            if should_stop and should_stop():
+                return [None] * len(batch)
+            try:
+                key = ('table', origin, tuple(batch))
+                return self.router.single_flight.do(key, lambda: self.router.table(origin, batch))
+            except (CircuitOpenError, RequestCancelled):
+                # A shared call cancelled by another job is retried on the second pass
+                return None
+            except Exception as e:
+                print(f"OSRM table error: {e}")
+                return [None] * len(batch)
+        
+        routed = {}
+        done = 0
+        with task_pool(self.router.concurrency, should_stop) as pool:
+            # Batches skipped by an open circuit get one more pass if a probe closed it
+            for attempt in range(2):
+                skipped = []
+                for batch, batch_routes in iter_completed(pool, route_batch, batches, should_stop):
+                    if batch_routes is None:
+                        skipped.append(batch)
+                        continue
+                    for destination, route in zip(batch, batch_routes):
+                        if route:
+                            routed[destination] = (route[0], route[1], False)
+                    done += len(batch)
+                    if progress:
+                        progress(done * len(destinations) // max(len(unique), 1))
+                
+                batches = skipped
+                if not batches or self.router.breaker.is_open:
+                    break
+        
+        if routed:
+            self.speed_model.observe(origin, list(routed), [state_of.get(d) for d in routed],
+                                     [r[0] for r in routed.values()], [r[1] for r in routed.values()])
+        
+        missing = [d for d in unique if d not in routed]
+        if missing:
+            distances, durations, _ = self.speed_model.estimate(origin, missing, [state_of.get(d) for d in missing])
+            for destination, distance, duration in zip(missing, distances.tolist(), durations.tolist()):
+                routed[destination] = (distance, duration, True)
+        return [routed[tuple(d)] for d in destinations]
+    
+    def pairwise_matrix(self, points, should_stop=None):
+        """Road distance and duration between every pair of points, as numpy arrays
+        
+        The matrix is fetched in blocks of batch_size sources x batch_size
+        destinations, in parallel up to the router's concurrency. Pairs the
+        router cannot answer fall back to the speed model's estimate.
+        """
+        import numpy as np
+        
+        n = len(points)
+        distances = np.full((n, n), np.nan)
+        durations = np.full((n, n), np.nan)
+        
+        size = self.router.batch_size
+        blocks = [(rows, cols) for rows in range(0, n, size) for cols in range(0, n, size)]
+        
+        def fetch_block(block):
+            rows, cols = block
+            if should_stop and should_stop():
+                return []
+            try:
+                return self.router.matrix(points[rows:rows + size], points[cols:cols + size])
+            except (CircuitOpenError, RequestCancelled):
+                return []
+            except Exception as e:
+                print(f"OSRM table error: {e}")
+                return []
+        
+        with task_pool(self.router.concurrency, should_stop) as pool:
+            for (rows, cols), block_routes in iter_completed(pool, fetch_block, blocks, should_stop):
+                for r, row_routes in enumerate(block_routes):
+                    for c, route in enumerate(row_routes):
+                        if route:
+                            distances[rows + r, cols + c], durations[rows + r, cols + c] = route
+        
+        missing = np.isnan(durations)
+        if missing.any():
+            coords = np.asarray(points, dtype=np.float64)
+            estimated_distances, estimated_durations, _ = self.speed_model.estimate(
+                coords[:, None, :], coords[None, :, :])
+            distances[missing] = estimated_distances[missing]
+            durations[missing] = estimated_durations[missing]
+        return distances, durations
+    
+    def place_by_postcode(self, origin, sites, outcomes):
+        """Place sites at their postcode centroid instead of geocoding them - returns their indices
+        
+        With geocode_by_postcode every unresolved site with a known postcode is
+        placed. Otherwise, with route_nearest set, only sites that stay outside the
+        nearest N even at the near edge of their postcode are placed: their
+        straight-line distance is a lower bound on the road distance, compared
+        with the speed model's upper bounds for every other site.
+        """
+        import numpy as np
+        
+        candidates = []
+        for i, site in enumerate(sites):
+            centroid = self.postcodes.get(site.postcode) if i not in outcomes else None
+            if centroid:
+                candidates.append((i, centroid))
+        nearest = self.config.get('route_nearest')
+        if not candidates or not (nearest or self.config.get('geocode_by_postcode')):
+            return []
+        
+        if not self.config.get('geocode_by_postcode'):
+            centres = np.array([c[:2] for _, c in candidates])
+            radius = np.array([c[2] for _, c in candidates])
+            straight, _ = estimate_routes(origin, centres)
+            distances, _, error = self.speed_model.estimate(origin, centres, [sites[i].state for i, _ in candidates])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                upper = np.where(error <= 1, distances * (straight + radius) / straight * (1 + error), np.inf)
+            
+            # Located sites bound the cutoff too; unresolved ones without a centroid could be anywhere
+            located = [(s.lat, s.lon) for s in sites if s.lat and s.lon]
+            unplaced = len(sites) - len(outcomes) - len(candidates)
+            bounds = [upper, np.full(unplaced, np.inf)]
+            if located:
+                known, _, known_error = self.speed_model.estimate(origin, located, [s.state for s in sites if s.lat and s.lon])
+                bounds.append(np.where(known_error <= 1, known * (1 + known_error), np.inf))
+            bounds = np.concatenate(bounds)
+            if nearest >= len(bounds):
+                return []
+            cutoff = np.partition(bounds, nearest - 1)[nearest - 1]
+            far = straight - radius > cutoff
+            candidates = [candidate for candidate, is_far in zip(candidates, far) if is_far]
+        
+        for i, (lat, lon, _) in candidates:
+            sites[i].apply_location(CacheEntry(lat, lon, 3, 'postcode centroid'))
+            outcomes[i] = match_status(3, 'postcode centroid')
+        return [i for i, _ in candidates]
+    
+    def record_geocode(self, site, result, errored):
+        """Store a site's geocoding result in the caches and return its (status, tag)"""
+        if result:
+            entry = CacheEntry(*result)
+            self.geocode_cache.put(site.cache_key, entry)
+            site.apply_location(entry)
+            return match_status(entry.match_level, entry.match_desc)
+        
+        # Only remember genuine "no match" answers, not network failures
+        if not errored:
+            self.negative_cache.add(site.cache_key)
+            site.status = 'not_found'
+        return '✗ Not Found', 'error'
+    
+    def far_sites(self, origin, destinations, states, nearest):
+        """Speed model estimates for destinations that cannot be among the nearest N
+        
+        A destination is left unrouted when its error is within estimate_max_error
+        and even the low end of its estimated distance is beyond the N-th smallest
+        high end. Returns {position: (distance_km, duration_min, True)}.
+        """
+        import numpy as np
+        
+        if nearest >= len(destinations):
+            return {}
+        max_error = self.config.get('estimate_max_error', ESTIMATE_MAX_ERROR)
+        distances, durations, error = self.speed_model.estimate(origin, destinations, states)
+        # Unknown (NaN) errors compare False, so those sites are always routed
+        trusted = error <= max_error
+        upper = np.where(trusted, distances * (1 + error), np.inf)
+        cutoff = np.partition(upper, nearest - 1)[nearest - 1]
+        far = trusted & (distances * (1 - error) > cutoff)
+        return {int(i): (float(distances[i]), float(durations[i]), True) for i in np.flatnonzero(far)}
+    
+    def route_sites(self, origin, keys, coords, report=None, should_stop=None, states=None, nearest=None):
+        """Route from origin to sites given by cache key and (lat, lon), None if not located
+        
+        From a depot, routes come from the precomputed matrix and only the rest
+        are routed, in batched table requests. With nearest set, sites the speed
+        model places outside the nearest N keep its estimate instead of being
+        routed. Returns ({site index: (distance_km, duration_min, estimated)},
+        number of routes answered from the matrix, indices of sites left unrouted).
+        """
+        report = report or (lambda kind, data: None)
+        states = states or [None] * len(coords)
+        located = [i for i, point in enumerate(coords) if point]
+        
+        routes = {}
+        depot_row = self.route_matrix.depot_row(origin)
+        if depot_row is not None:
+            known = self.route_matrix.lookup(depot_row, [keys[i] for i in located])
+            routes = {i: route + (False,) for i, route in zip(located, known) if route}
+        matrix_routes = len(routes)
+        unrouted = [i for i in located if i not in routes]
+        
+        skipped = set()
+        if nearest and unrouted:
+            far = self.far_sites(origin, [coords[i] for i in unrouted], [states[i] for i in unrouted], nearest)
+            skipped = {unrouted[pos] for pos in far}
+            routes.update((unrouted[pos], route) for pos, route in far.items())
+            unrouted = [i for i in unrouted if i not in skipped]
+        
+        if unrouted:
+            report('status', f"🚗 Routing {len(unrouted)} site(s)...")
+            
+            def routing_progress(done):
+                report('progress', 0.6 + done / len(unrouted) * 0.4)
+            
+            destinations = [coords[i] for i in unrouted]
+            routes.update(zip(unrouted, self.get_routes(origin, destinations, routing_progress, should_stop,
+                                                        [states[i] for i in unrouted])))
+        return routes, matrix_routes, skipped
+    
+    @staticmethod
+    def rank(sites, outcomes, routes):
+        """Result records for sites, sorted by distance - unrouted sites sort last"""
+        results = DistanceEngine.records(sites, outcomes, routes)
+        results.sort(key=lambda x: x.distance)
+        return results
+    
+    @staticmethod
+    def records(sites, outcomes, routes):
+        """Result records for sites, in site order"""
+        results = []
+        for i, site in enumerate(sites):
+            status, tag = outcomes[i]
+            if i in routes:
+                distance_km, duration_min, estimated = routes[i]
+                match_level = site.match_level
+            else:
+                distance_km = float('inf')
+                duration_min = float('inf')
+                match_level = 999
+                estimated = False
+            results.append(ResultRecord(site, distance_km, duration_min, status, tag, match_level, estimated))
+        return results
+    
+    def calculate(self, origin, sites, report=None, should_stop=None, incremental=False):
+        """Geocode and route sites from an origin (lat, lon)
+        
+        With incremental set, the last run from the same origin is remembered and
+        sites unchanged since then keep its results, so only added or changed
+        sites are geocoded and routed. Not-found sites and estimates made while
+        the router was down are always recomputed. Returns (results sorted by
+        distance, stats), or None if stopped.
+        """
+        report = report or (lambda kind, data: None)
+        should_stop = should_stop or (lambda: False)
+        
+        run_key = (round(origin[0], 5), round(origin[1], 5))
+        memo = self.runs.get(run_key, {}) if incremental else {}
+        identities = [(site.full_address, site.lat, site.lon) for site in sites]
+        removed = len(memo.keys() - set(identities))
+        if removed:
+            # Removing sites can bring a far site into the nearest N, so its estimate is redone
+            memo = {identity: record for identity, record in memo.items() if not record.estimated}
+        
+        outcomes = {}
+        routes = {}
+        for i, identity in enumerate(identities):
+            record = memo.get(identity)
+            if record:
+                site = sites[i]
+                site.lat, site.lon, site.match_level = record.lat, record.lon, record.match_level
+                outcomes[i] = (record.status, record.tag)
+                routes[i] = (record.distance, record.duration, record.estimated)
+                report('update_row', (i,) + outcomes[i])
+        reused = len(routes)
+        if reused:
+            report('status', f"♻ {reused} unchanged site(s) reused - computing {len(sites) - reused}...")
+        
+        # Snapshot the single-flight counters to report this run's collapsed calls
+        geocode_collapsed = self.geocoder.single_flight.counters()[1]
+        route_collapsed = self.router.single_flight.counters()[1]
+        overloads = self.geocoder.control.overloads + self.router.control.overloads
+        trips = self.router.breaker.trips
+        hedges = self.router.hedge_counts[1:]
+        
+        # Cached sites already have coordinates; recent failures are not retried
+        for i, site in enumerate(sites):
+            if i in outcomes:
+                continue
+            if not (site.lat and site.lon):
+                entry = self.geocode_cache.get(site.cache_key) or self.stored_location(site.cache_key)
+                if entry:
+                    site.apply_location(entry)
+                    site.status = 'cached'
+            
+            if site.lat and site.lon:
+                outcomes[i] = ("💾 Cached", 'cached')
+            elif site.cache_key in self.negative_cache:
+                outcomes[i] = ('✗ Not Found', 'error')
+            else:
+                continue
+            report('update_row', (i,) + outcomes[i])
+        
+        # Geocode the rest as one batch, sharing cascade queries between sites
+        placed = self.place_by_postcode(origin, sites, outcomes)
+        for i in placed:
+            report('update_row', (i,) + outcomes[i])
+        
+        # Variants of one address (same canonical key) share the first variant's query
+        pending = {}
+        queries = {}
+        for i in range(len(sites)):
+            if i not in outcomes:
+                key = sites[i].cache_key
+                queries.setdefault(key, sites[i].full_address)
+                pending.setdefault(queries[key], []).append(i)
+        
+        if pending:
+            report('status', f"⏳ Geocoding {len(pending)} address(es)...")
+            
+            def on_result(address, result, errored):
+                for i in pending[address]:
+                    outcomes[i] = self.record_geocode(sites[i], result, errored)
+                    report('update_row', (i,) + outcomes[i])
+                report('progress', 0.05 + len(outcomes) / len(sites) * 0.55)
+            
+            self.cascade.resolve(list(pending), on_result, should_stop)
+        
+        if should_stop():
+            return None
+        
+        fresh_routes, matrix_routes, skipped = self.route_sites(
+            origin,
+            [site.cache_key for site in sites],
+            [(site.lat, site.lon) if site.lat and site.lon and i not in routes else None
+             for i, site in enumerate(sites)],
+            report, should_stop,
+            [site.state for site in sites],
+            self.config.get('route_nearest')
+        )
+        
+        if should_stop():
+            return None
+        
+        routes.update(fresh_routes)
+        records = self.records(sites, outcomes, routes)
+        if incremental:
+            # Remember only final results: routed sites, memo hits and far sites left unrouted by choice
+            self.runs[run_key] = {
+                identity: record for i, (identity, record) in enumerate(zip(identities, records))
+                if record.tag != 'error' and (not record.estimated or i in skipped or i not in fresh_routes)
+            }
+            self.runs.move_to_end(run_key)
+            while len(self.runs) > self.MEMO_RUNS:
+                self.runs.popitem(last=False)
+        
+        results = sorted(records, key=lambda x: x.distance)
+        stats = {
+            'collapsed_geocodes': self.geocoder.single_flight.counters()[1] - geocode_collapsed,
+            'collapsed_routes': self.router.single_flight.counters()[1] - route_collapsed,
+            'matrix_routes': matrix_routes,
+            'throttled': self.geocoder.control.overloads + self.router.control.overloads - overloads,
+            'estimated_routes': sum(1 for route in fresh_routes.values() if route[2]) - len(skipped),
+            'skipped_routes': len(skipped),
+            'reused': reused,
+            'removed': removed,
+            'postcode_placed': len(placed),
+            'router_down': self.router.breaker.trips > trips or self.router.breaker.is_open,
+            'hedged_routes': self.router.hedge_counts[1] - hedges[0],
+            'hedge_wins': self.router.hedge_counts[2] - hedges[1],
+            'router_hedging': self.router.hedge_stats()
+        }
+        return results, stats
+
+
+class CancelToken:
+    """Cancellation flag for a job - callable, so it doubles as a should_stop check"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+    
+    def __call__(self):
+        return self.event.is_set()
+    
+    def cancel(self):
+        self.event.set()
+    
+    def wait(self, timeout):
+        """Sleep up to timeout seconds - returns True as soon as the job is cancelled"""
+        return self.event.wait(timeout)
+
+
+class Job:
+    """A queued unit of work whose inputs are fixed when it is submitted"""
+    __slots__ = ('id', 'label', 'priority', 'args', 'token', 'state', 'submitted', 'started', 'finished', 'error')
+    
+    def __init__(self, job_id, label, priority, args):
+        self.id = job_id
+        self.label = label
+        self.priority = priority
+        self.args = args
+        self.token = CancelToken()
+        self.state = 'queued'
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+
+
+class JobScheduler:
+    """Runs jobs one at a time on a worker thread, highest priority first
+    
+    Jobs of equal priority run in submission order. run(job) does the work and
+    passes job.token on as its should_stop check. Cancelling a queued job drops
+    it; cancelling the running job sets its token, which stops its in-flight
+    requests. on_change(job) is called from either thread on every state change
+    ('queued', 'running', 'done', 'cancelled' or 'failed').
+    """
+    PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+    
+    def __init__(self, run, on_change=None):
+        self.run = run
+        self.on_change = on_change or (lambda job: None)
+        self.queue = []
+        self.current = None
+        self.ids = itertools.count(1)
+        self.condition = threading.Condition()
+        self.worker = None
+    
+    def submit(self, label, args, priority='normal'):
+        """Queue a job - returns it"""
+        with self.condition:
+            job = Job(next(self.ids), label, self.PRIORITIES[priority], args)
+            heapq.heappush(self.queue, (job.priority, job.id, job))
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.work, daemon=True)
+                self.worker.start()
+            self.condition.notify()
+        self.on_change(job)
+        return job
+    
+    def queued(self):
+        """Jobs waiting to run, in the order they will run"""
+        with self.condition:
+            return [entry[2] for entry in sorted(self.queue)]
+    
+    def ahead_of(self, job):
+        """Number of jobs that will run before a queued job"""
+        with self.condition:
+            return sum(1 for entry in self.queue if entry < (job.priority, job.id, job)) + (self.current is not None)
+    
+    def cancel(self, job_id=None):
+        """Cancel a job by id, or the running job by default - returns the job or None"""
+        with self.condition:
+            if self.current and job_id in (None, self.current.id):
+                # The worker marks it cancelled once run() returns
+                self.current.token.cancel()
+                return self.current
+            for entry in self.queue:
+                if entry[2].id == job_id:
+                    self.queue.remove(entry)
+                    heapq.heapify(self.queue)
+                    job = entry[2]
+                    break
+            else:
+                return None
+            job.token.cancel()
+            job.state = 'cancelled'
+        self.on_change(job)
+        return job
+    
+    def cancel_all(self):
+        """Cancel the running job and every queued one - returns the number cancelled"""
+        with self.condition:
+            queued = [entry[2] for entry in self.queue]
+            self.queue = []
+            running = self.current
+            if running:
+                running.token.cancel()
+        for job in queued:
+            job.token.cancel()
+            job.state = 'cancelled'
+            self.on_change(job)
+        return len(queued) + (running is not None)
+    
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                job = heapq.heappop(self.queue)[2]
+                self.current = job
+                job.state = 'running'
+                job.started = time.time()
+            self.on_change(job)
+            
+            try:
+                self.run(job)
+                job.state = 'cancelled' if job.token() else 'done'
+            except Exception as e:
+                job.state = 'failed'
+                job.error = e
+            
+            with self.condition:
+                self.current = None
+                job.finished = time.time()
+            self.on_change(job)
+
+
+EXPORT_COLUMNS = ['rank', 'address', 'suburb', 'state', 'distance_km', 'duration_min',
+                  'estimated', 'status', 'match_level', 'lat', 'lon']
+
+
+def iter_export_chunks(store, chunk_size=5000):
+    """Yield lists of export rows from a result store, one chunk at a time
+    
+    Rows follow the store's sort order at the time of the call. Unknown values
+    (unresolved distances, missing coordinates) are None.
+    """
+    import numpy as np
+    
+    order = store.order.copy()
+    ranks = store.distance_ranks(order)
+    for start in range(0, len(order), chunk_size):
+        idx = order[start:start + chunk_size]
+        distance = store.distance[idx]
+        duration = store.duration[idx]
+        lat = store.lat[idx]
+        lon = store.lon[idx]
+        rows = []
+        for pos, i in enumerate(idx):
+            finite = np.isfinite(distance[pos])
+            rows.append([
+                int(ranks[start + pos]),
+                store.address[i],
+                store.suburb[i],
+                store.state[i],
+                round(float(distance[pos]), 3) if finite else None,
+                round(float(duration[pos]), 1) if finite else None,
+                bool(store.estimated[i]),
+                store.status[i],
+                int(store.match_level[i]),
+                float(lat[pos]) if np.isfinite(lat[pos]) else None,
+                float(lon[pos]) if np.isfinite(lon[pos]) else None
+            ])
+        yield rows
+
+
+def export_csv(store, path, progress=None, chunk_size=5000):
+    """Stream results to a CSV file"""
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in iter_export_chunks(store, chunk_size):
+            writer.writerows(['' if v is None else v for v in row] for row in rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+
+def export_geojson(store, path, progress=None, chunk_size=5000):
+    """Stream results to a GeoJSON FeatureCollection, one feature per result"""
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        for rows in iter_export_chunks(store, chunk_size):
+            features = []
+            for row in rows:
+                record = dict(zip(EXPORT_COLUMNS, row))
+                lat, lon = record.pop('lat'), record.pop('lon')
+                geometry = {'type': 'Point', 'coordinates': [lon, lat]} if lat is not None else None
+                features.append(json.dumps(
+                    {'type': 'Feature', 'geometry': geometry, 'properties': record},
+                    ensure_ascii=False
+                ))
+            f.write((',\n' if written else '') + ',\n'.join(features))
+            written += len(rows)
+            if progress:
+                progress(written)
+        f.write('\n]}\n')
+    return written
+
+
+def export_parquet(store, path, progress=None, chunk_size=50000):
+    """Stream results to a Parquet file, one row group per chunk (requires pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([
+        ('rank', pa.int64()), ('address', pa.string()), ('suburb', pa.string()),
+        ('state', pa.string()), ('distance_km', pa.float64()), ('duration_min', pa.float64()),
+        ('estimated', pa.bool_()), ('status', pa.string()), ('match_level', pa.int32()), ('lat', pa.float64()),
+        ('lon', pa.float64())
+    ])
+    
+    written = 0
+    with pq.ParquetWriter(str(path), schema) as writer:
+        for rows in iter_export_chunks(store, chunk_size):
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema
+            ))
+            written += len(rows)
+            if progress:
+                progress(written)
+    return written
+
+
+EXPORTERS = {
+    '.csv': export_csv,
+    '.geojson': export_geojson,
+    '.json': export_geojson,
+    '.parquet': export_parquet
+}
+
 
 class GlassFrame(ctk.CTkFrame):
     """Custom glassmorphic frame with semi-transparent effect"""
@@ -59,13 +3185,13 @@ class AddressDistanceCalculator:
             'text_secondary': '#95a5a6'
         }
         
-        # Store site addresses with geocoding cache
+        # Store site addresses; geocoding, routing and caches live in the engine
         self.site_addresses = []
-        self.geocode_cache = {}
-        self.all_results = []
+        self.engine = DistanceEngine()
+        self.all_results = EmptyResultStore()
         
-        # Load persistent cache
-        self.load_cache()
+        # Persistent cache is loaded in the background once the window has painted
+        self.cache_ready = self.engine.cache_ready
         
         # Filter states
         self.filter_vars = {
@@ -76,10 +3202,16 @@ class AddressDistanceCalculator:
         }
         
         # Threading control
-        self.calculation_thread = None
-        self.stop_calculation = False
+        self.export_thread = None
+        self.plan_thread = None
         self.result_queue = Queue()
         
+        # Calculations are queued jobs working on a snapshot of the site list
+        self.jobs = JobScheduler(self.calculate_distances_worker,
+                                 lambda job: self.result_queue.put(('job', (job, job.state))))
+        # Bumped whenever rows are removed, so queued jobs stop updating row statuses
+        self.sites_version = 0
+        
         # Column selection for copying
         self.selected_columns = set()
         
@@ -101,6 +3233,9 @@ class AddressDistanceCalculator:
         
         # Start result queue processor
         self.process_queue()
+        
+        # Defer the cache load until Tk is idle so the first paint is not blocked
+        self.root.after_idle(self.start_cache_loader)
     
     def create_ui(self):
         """Create the modern glassmorphic user interface"""
@@ -150,7 +3285,20 @@ class AddressDistanceCalculator:
             hover_color="#2c3e50",
             font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold")
         )
-        self.theme_btn.grid(row=0, column=1, sticky="e", padx=(10, 0))
+        self.theme_btn.grid(row=0, column=2, sticky="e", padx=(10, 0))
+        
+        self.cache_btn = ctk.CTkButton(
+            title_frame,
+            text="📊 Cache",
+            command=self.show_cache_stats,
+            width=100,
+            height=34,
+            corner_radius=8,
+            fg_color="#34495e",
+            hover_color="#2c3e50",
+            font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold")
+        )
+        self.cache_btn.grid(row=0, column=1, sticky="e", padx=(10, 0))
         
         # LEFT COLUMN - Input Section
         left_column = ctk.CTkFrame(main_frame, fg_color="transparent")
@@ -328,6 +3476,31 @@ class AddressDistanceCalculator:
         )
         self.calc_btn.pack(side="left", padx=2)
         
+        self.priority_var = ctk.StringVar(value="Normal")
+        ctk.CTkOptionMenu(
+            btn_row_frame,
+            values=["High", "Normal", "Low"],
+            variable=self.priority_var,
+            width=90,
+            height=34,
+            corner_radius=8,
+            font=ctk.CTkFont(family="Segoe UI", size=11)
+        ).pack(side="left", padx=2)
+        
+        self.cancel_btn = ctk.CTkButton(
+            btn_row_frame,
+            text="⏹ Cancel",
+            command=self.cancel_calculation,
+            width=90,
+            height=34,
+            corner_radius=8,
+            fg_color="#7f8c8d",
+            hover_color="#636e72",
+            state="disabled",
+            font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold")
+        )
+        self.cancel_btn.pack(side="left", padx=2)
+        
         # RIGHT COLUMN - Results Section
         right_column = ctk.CTkFrame(main_frame, fg_color="transparent")
         right_column.grid(row=1, column=1, sticky="nsew", padx=(8, 0))
@@ -375,6 +3548,32 @@ class AddressDistanceCalculator:
         )
         self.copy_btn.grid(row=0, column=1, sticky="e", padx=(10, 0))
         
+        self.export_btn = ctk.CTkButton(
+            results_header_frame,
+            text="💾 Export",
+            command=self.export_results,
+            width=110,
+            height=32,
+            corner_radius=8,
+            fg_color="#8e44ad",
+            hover_color="#7d3c98",
+            font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold")
+        )
+        self.export_btn.grid(row=0, column=2, sticky="e", padx=(6, 0))
+        
+        self.plan_btn = ctk.CTkButton(
+            results_header_frame,
+            text="🗺 Plan Route",
+            command=self.plan_day_route,
+            width=120,
+            height=32,
+            corner_radius=8,
+            fg_color="#d35400",
+            hover_color="#ba4a00",
+            font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold")
+        )
+        self.plan_btn.grid(row=0, column=3, sticky="e", padx=(6, 0))
+        
         # Compact filter controls
         filter_frame = ctk.CTkFrame(results_frame, fg_color="transparent")
         filter_frame.grid(row=1, column=0, sticky="ew", padx=12, pady=(0, 6))
@@ -438,6 +3637,18 @@ class AddressDistanceCalculator:
             checkbox_height=18
         ).pack(side="left", padx=3)
         
+        ctk.CTkButton(
+            filter_frame,
+            text="↻ Retry Not Found",
+            command=self.retry_not_found,
+            width=130,
+            height=26,
+            corner_radius=6,
+            fg_color="#7f8c8d",
+            hover_color="#707b7c",
+            font=ctk.CTkFont(family="Segoe UI", size=10, weight="bold")
+        ).pack(side="right", padx=3)
+        
         # Results table
         self.results_scroll = ctk.CTkScrollableFrame(
             results_frame,
@@ -465,10 +3676,19 @@ class AddressDistanceCalculator:
                 cursor="hand2"
             )
             header_label.grid(row=0, column=idx, padx=2, pady=3, sticky="w")
-            header_label.bind("<Button-1>", lambda e, col=idx: self.select_column(col))
+            header_label.bind("<Button-1>", lambda e, col=idx: self.sort_by_column(col))
+            header_label.bind("<Shift-Button-1>", lambda e, col=idx: self.sort_by_column(col, add_key=True))
+            header_label.bind("<Control-Button-1>", lambda e, col=idx: self.select_column(col))
             self.result_header_labels.append(header_label)
+        self.result_headers = result_headers
         
+        # Row widgets are pooled - filtering and sorting reconfigure them in place
         self.results_rows = []
+        self.visible_result_rows = 0
+        self.visible_indices = []
+        
+        # Technician location of the last calculation, the start of planned routes
+        self.result_origin = None
         
         # Status bar - full width at bottom
         status_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
@@ -532,27 +3752,94 @@ class AddressDistanceCalculator:
         # This method can be extended to update specific elements if needed
         pass
     
+    def start_cache_loader(self):
+        """Start loading the persistent cache on a background thread"""
+        threading.Thread(target=self.load_cache, daemon=True).start()
+    
     def load_cache(self):
         """Load geocoding cache from persistent storage"""
-        try:
-            if CACHE_FILE.exists():
-                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                    self.geocode_cache = json.load(f)
-                print(f"✓ Loaded {len(self.geocode_cache)} cached addresses from {CACHE_FILE}")
-            else:
-                print("ℹ No cache file found, starting with empty cache")
-        except Exception as e:
-            print(f"⚠ Error loading cache: {e}")
-            self.geocode_cache = {}
+        count = self.engine.load_caches()
+        self.result_queue.put(('cache_loaded', count))
+    
+    def apply_loaded_cache(self, count):
+        """Mark pending sites that were added before the cache finished loading"""
+        for idx, site in enumerate(self.site_addresses):
+            if site.status != 'pending':
+                continue
+            
+            found = self.engine.apply_cached(site)
+            if found == 'cached':
+                self.update_input_row_status(idx, '💾 Cached', 'cached')
+            elif found == 'not_found':
+                self.update_input_row_status(idx, '✗ Not Found', 'error')
+        
+        if count:
+            print(f"ℹ Address cache ready ({count} entries)")
     
     def save_cache(self):
         """Save geocoding cache to persistent storage"""
-        try:
-            with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.geocode_cache, f, indent=2, ensure_ascii=False)
-            print(f"✓ Saved {len(self.geocode_cache)} addresses to cache")
-        except Exception as e:
-            print(f"⚠ Error saving cache: {e}")
+        self.engine.save_caches()
+    
+    def compact_cache(self):
+        """Merge address variants, evict down to the cache caps, drop expired not-found entries and rewrite the files"""
+        if not self.cache_ready.is_set():
+            self.status_var.set("⏳ Cache is still loading")
+            return 0
+        
+        cache = self.engine.geocode_cache
+        merged = cache.canonicalise(canonical_key)
+        evicted = cache.compact()
+        self.engine.negative_cache.prune()
+        cache.dirty = True
+        self.save_cache()
+        status = f"🧹 Cache compacted - {evicted} entries evicted, {len(cache)} kept"
+        if merged:
+            status += f", {merged} address variant(s) merged"
+        self.status_var.set(status)
+        return evicted
+    
+    def show_cache_stats(self):
+        """Show cache statistics in a small window with a compaction action"""
+        window = ctk.CTkToplevel(self.root)
+        window.title("Address Cache")
+        window.geometry("460x300")
+        window.transient(self.root)
+        
+        stats_label = ctk.CTkLabel(
+            window,
+            text="",
+            justify="left",
+            anchor="nw",
+            font=ctk.CTkFont(family="Consolas", size=11)
+        )
+        stats_label.pack(fill="both", expand=True, padx=16, pady=(16, 8))
+        
+        def refresh():
+            if self.cache_ready.is_set():
+                stats = self.engine.geocode_cache.stats(CACHE_FILE)
+                text = format_cache_stats(stats)
+                text += f"\n\nNot-found entries: {len(self.engine.negative_cache):,}"
+            else:
+                text = "⏳ Cache is still loading..."
+            stats_label.configure(text=text)
+        
+        def compact():
+            self.compact_cache()
+            refresh()
+        
+        ctk.CTkButton(
+            window,
+            text="🧹 Compact Cache",
+            command=compact,
+            width=150,
+            height=32,
+            corner_radius=8,
+            fg_color="#16a085",
+            hover_color="#138d75",
+            font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold")
+        ).pack(pady=(0, 16))
+        
+        refresh()
     
     def on_closing(self):
         """Handle application closing - save cache and cleanup"""
@@ -679,41 +3966,31 @@ class AddressDistanceCalculator:
         else:
             return f"{mins} min"
     
-    def add_result_row(self, rank, address, suburb, state, distance, duration, status, tag='success'):
-        """Add a row to the results table with selectable cells"""
+    def add_result_row(self):
+        """Create an empty row in the results table with selectable cells"""
         row_num = len(self.results_rows) + 1
         
-        # Color coding based on tag
-        colors = {
-            'success': '#27ae60',
-            'cached': '#3498db',
-            'warning': '#e67e22',
-            'error': '#c0392b'
-        }
-        
-        fg_color = colors.get(tag, ('#7f8c8d', '#95a5a6'))
-        
         # Create row frame
         row_frame = ctk.CTkFrame(self.results_scroll, fg_color="transparent")
         row_frame.grid(row=row_num, column=0, columnspan=7, sticky="ew", pady=2)
         row_frame.grid_columnconfigure(1, weight=1)
         
-        # Cell data and configuration - all aligned to the left
-        cell_data = [
-            (str(rank), 45, ctk.CTkFont(size=10, weight="bold"), ("#2c3e50", "#ecf0f1"), "w"),
-            (address, 280, ctk.CTkFont(size=10), None, "w"),
-            (suburb, 110, ctk.CTkFont(size=10), None, "w"),
-            (state, 60, ctk.CTkFont(size=10), None, "w"),
-            (distance, 75, ctk.CTkFont(size=10), "#3498db", "w"),
-            (duration, 100, ctk.CTkFont(size=10), "#3498db", "w"),
-            (status, 140, ctk.CTkFont(size=10, weight="bold"), fg_color, "w")
+        # Cell configuration - all aligned to the left
+        cell_config = [
+            (45, ctk.CTkFont(size=10, weight="bold"), ("#2c3e50", "#ecf0f1"), "w"),
+            (280, ctk.CTkFont(size=10), None, "w"),
+            (110, ctk.CTkFont(size=10), None, "w"),
+            (60, ctk.CTkFont(size=10), None, "w"),
+            (75, ctk.CTkFont(size=10), "#3498db", "w"),
+            (100, ctk.CTkFont(size=10), "#3498db", "w"),
+            (140, ctk.CTkFont(size=10, weight="bold"), None, "w")
         ]
         
         cells = []
-        for col_idx, (text, width, font, text_color, anchor) in enumerate(cell_data):
+        for col_idx, (width, font, text_color, anchor) in enumerate(cell_config):
             cell_label = ctk.CTkLabel(
                 row_frame, 
-                text=text, 
+                text="", 
                 width=width, 
                 font=font, 
                 anchor=anchor,
@@ -737,6 +4014,27 @@ class AddressDistanceCalculator:
         
         self.results_rows.append({'frame': row_frame, 'cells': cells})
     
+    def update_result_row(self, row_index, rank, address, suburb, state, distance, duration, status, tag='success'):
+        """Show a result in an existing (pooled) results table row"""
+        # Color coding based on tag
+        colors = {
+            'success': '#27ae60',
+            'cached': '#3498db',
+            'warning': '#e67e22',
+            'error': '#c0392b'
+        }
+        
+        fg_color = colors.get(tag, ('#7f8c8d', '#95a5a6'))
+        
+        row = self.results_rows[row_index]
+        values = (str(rank), address, suburb, state, distance, duration, status)
+        for cell, text in zip(row['cells'], values):
+            if cell.cget("text") != text:
+                cell.configure(text=text)
+        if row['cells'][6].cget("text_color") != fg_color:
+            row['cells'][6].configure(text_color=fg_color)
+        row['frame'].grid()
+    
     def clear_input_rows(self):
         """Clear all input rows"""
         for row in self.input_rows:
@@ -811,15 +4109,57 @@ class AddressDistanceCalculator:
         self.clear_cell_selection()
         
         # Select all cells in this column
-        for row_idx in range(1, len(self.results_rows) + 1):
+        for row_idx in range(1, self.visible_result_rows + 1):
             self.selected_cells.add((row_idx, col))
         
-        self.last_clicked_cell = (1, col)
-        self.highlight_selected_cells()
+        self.last_clicked_cell = (1, col)
+        self.highlight_selected_cells()
+    
+    def sort_by_column(self, col, add_key=False):
+        """Sort results by a header's column - click toggles, shift-click adds a sort key"""
+        if not len(self.all_results):
+            return
+        
+        column = RESULT_SORT_COLUMNS[col]
+        keys = list(self.all_results.sort_keys)
+        existing = [i for i, (name, _) in enumerate(keys) if name == column]
+        
+        if add_key:
+            if existing:
+                name, descending = keys[existing[0]]
+                keys[existing[0]] = (name, not descending)
+            else:
+                keys.append((column, False))
+        elif len(keys) == 1 and existing:
+            keys = [(column, not keys[0][1])]
+        else:
+            keys = [(column, False)]
+        
+        start = time.perf_counter()
+        self.all_results.sort(keys)
+        sort_ms = (time.perf_counter() - start) * 1000
+        
+        self.render_results()
+        description = ", ".join(f"{name} {'▼' if desc else '▲'}" for name, desc in keys)
+        self.status_var.set(f"↕ Sorted by {description} ({sort_ms:.1f} ms)")
+    
+    def update_sort_indicators(self):
+        """Show sort direction arrows on the result headers"""
+        keys = self.all_results.sort_keys
+        for idx, label in enumerate(self.result_header_labels):
+            text = self.result_headers[idx]
+            column = RESULT_SORT_COLUMNS[idx]
+            for position, (name, descending) in enumerate(keys):
+                # Rank and Dist(km) share the distance key; mark only Dist(km)
+                if name == column and not (idx == 0 and column == 'distance'):
+                    arrow = '▼' if descending else '▲'
+                    text += f" {arrow}" if len(keys) == 1 else f" {arrow}{position + 1}"
+            if label.cget("text") != text:
+                label.configure(text=text)
     
     def clear_cell_selection(self):
         """Clear all cell selections and remove highlights"""
-        for row_idx, row in enumerate(self.results_rows, start=1):
+        for row_idx, row in enumerate(self.results_rows[:self.visible_result_rows], start=1):
             for col_idx, cell in enumerate(row['cells']):
                 cell.configure(fg_color="transparent")
         self.selected_cells.clear()
@@ -831,7 +4171,7 @@ class AddressDistanceCalculator:
     def highlight_selected_cells(self):
         """Highlight all selected cells"""
         # First clear all highlights
-        for row_idx, row in enumerate(self.results_rows, start=1):
+        for row_idx, row in enumerate(self.results_rows[:self.visible_result_rows], start=1):
             for col_idx, cell in enumerate(row['cells']):
                 cell.configure(fg_color="transparent")
         
@@ -839,7 +4179,7 @@ class AddressDistanceCalculator:
         selection_color = ("#b3d9ff", "#2d5f8f")  # Light blue for light mode, darker blue for dark mode
         
         for (row, col) in self.selected_cells:
-            if 1 <= row <= len(self.results_rows):
+            if 1 <= row <= self.visible_result_rows:
                 row_data = self.results_rows[row - 1]
                 if 0 <= col < len(row_data['cells']):
                     row_data['cells'][col].configure(fg_color=selection_color)
@@ -896,7 +4236,7 @@ class AddressDistanceCalculator:
         """Select all cells in the results table"""
         self.clear_cell_selection()
         
-        for row_idx in range(1, len(self.results_rows) + 1):
+        for row_idx in range(1, self.visible_result_rows + 1):
             for col_idx in range(7):  # 7 columns
                 self.selected_cells.add((row_idx, col_idx))
         
@@ -908,585 +4248,1976 @@ class AddressDistanceCalculator:
         if (row, col) not in self.selected_cells:
             self.on_cell_click(event, row, col)
         
-        # Create context menu
-        context_menu = tk.Menu(self.root, tearoff=0)
-        context_menu.add_command(label="Copy Selected Cells", command=self.copy_selected_cells)
-        context_menu.add_command(label="Copy All Results", command=self.copy_all_results)
-        context_menu.add_separator()
-        context_menu.add_command(label="Select All (Ctrl+A)", command=self.select_all_results)
-        context_menu.add_command(label="Clear Selection (Esc)", command=self.clear_cell_selection)
+        # Create context menu
+        context_menu = tk.Menu(self.root, tearoff=0)
+        context_menu.add_command(label="Copy Selected Cells", command=self.copy_selected_cells)
+        context_menu.add_command(label="Copy All Results", command=self.copy_all_results)
+        context_menu.add_separator()
+        context_menu.add_command(label="Retry Not-Found Sites", command=self.retry_not_found)
+        context_menu.add_command(label="Select All (Ctrl+A)", command=self.select_all_results)
+        context_menu.add_command(label="Clear Selection (Esc)", command=self.clear_cell_selection)
+        
+        # Display menu at cursor position
+        try:
+            context_menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            context_menu.grab_release()
+    
+    def handle_paste(self, event=None):
+        """Handle paste event"""
+        self.root.after(100, self.auto_process_hint)
+        return None
+    
+    def handle_tech_address_paste(self, event=None):
+        """Handle paste event for technician address with auto-formatting"""
+        self.root.after(100, self.auto_format_tech_address)
+        return None
+    
+    def auto_format_tech_address(self, event=None):
+        """Auto-format the technician address by cleaning up whitespace, newlines, and tabs"""
+        current_text = self.tech_address.get("1.0", tk.END).strip()
+        
+        if not current_text:
+            return
+        
+        # Replace tabs with commas (for Excel column data)
+        formatted_text = current_text.replace('\t', ', ')
+        
+        # Replace newlines with commas
+        formatted_text = formatted_text.replace('\n', ', ')
+        formatted_text = formatted_text.replace('\r', '')
+        
+        # Remove double commas
+        while ', , ' in formatted_text:
+            formatted_text = formatted_text.replace(', , ', ', ')
+        
+        # Remove multiple consecutive whitespaces
+        formatted_text = re.sub(r'\s+', ' ', formatted_text)
+        
+        # Remove spaces before commas
+        formatted_text = re.sub(r'\s+,', ',', formatted_text)
+        
+        # Ensure single space after commas
+        formatted_text = re.sub(r',\s*', ', ', formatted_text)
+        
+        # Remove leading/trailing commas and whitespace
+        formatted_text = formatted_text.strip(', ').strip()
+        
+        # Only update if the text changed to avoid infinite loops
+        if formatted_text != current_text:
+            self.tech_address.delete("1.0", tk.END)
+            self.tech_address.insert("1.0", formatted_text)
+            self.status_var.set("✓ Technician address auto-formatted")
+    
+    def auto_process_hint(self):
+        """Show hint after pasting"""
+        pasted_text = self.paste_entry.get("1.0", tk.END).strip()
+        if pasted_text:
+            self.status_var.set("📋 Data pasted! Click 'Add' to process")
+    
+    def parse_address_line(self, line):
+        """Parse a single line of address data"""
+        return parse_address_line(line)
+    
+    def process_pasted_data(self):
+        """Process pasted data"""
+        pasted_text = self.paste_entry.get("1.0", tk.END).strip()
+        
+        if not pasted_text:
+            messagebox.showinfo("No Data", "Please paste address data first")
+            return
+        
+        lines = pasted_text.split('\n')
+        added_count = 0
+        skipped_count = 0
+        
+        # Variants of an address already in the list ("Street"/"St", unit numbers) are duplicates
+        known_keys = {site.cache_key for site in self.site_addresses}
+        
+        for line in lines:
+            site = self.parse_address_line(line)
+            
+            if site and (site.address or site.suburb) and site.state:
+                is_duplicate = site.cache_key in known_keys
+                
+                if not is_duplicate:
+                    known_keys.add(site.cache_key)
+                    found = self.engine.apply_cached(site)
+                    
+                    if found == 'cached':
+                        status, tag = '💾 Cached', 'cached'
+                    elif found == 'not_found':
+                        # Failed recently - skip it until the TTL expires or it is retried
+                        status, tag = '✗ Not Found', 'error'
+                    else:
+                        status, tag = 'Pending', 'pending'
+                    
+                    self.add_input_row(status, site.address, site.suburb, site.state, tag)
+                    
+                    self.site_addresses.append(site)
+                    added_count += 1
+                else:
+                    skipped_count += 1
+        
+        self.paste_entry.delete("1.0", tk.END)
+        
+        if added_count > 0:
+            status_msg = f"✓ Added {added_count} address(es)"
+            if skipped_count > 0:
+                status_msg += f" ({skipped_count} duplicate(s) skipped)"
+            status_msg += f". Total: {len(self.site_addresses)}"
+            self.status_var.set(status_msg)
+        else:
+            if skipped_count > 0:
+                messagebox.showinfo("Duplicates", 
+                                  f"All {skipped_count} address(es) already exist in the list.")
+                self.status_var.set(f"ℹ {skipped_count} duplicate(s) skipped")
+            else:
+                messagebox.showwarning("Invalid Format", 
+                                     "No valid addresses found.\n\n" +
+                                     "Supported formats:\n" +
+                                     "• Excel columns (tab-separated): Address | Suburb | State\n" +
+                                     "• Comma-separated: Address, Suburb, State\n" +
+                                     "• Full address: Street, Suburb, STATE 1234")
+                self.status_var.set("⚠ No valid addresses found")
+    
+    def retry_not_found(self):
+        """Forget cached not-found results for the current sites and recalculate"""
+        retried = 0
+        for idx, site in enumerate(self.site_addresses):
+            if site.status == 'not_found' or site.cache_key in self.engine.negative_cache:
+                self.engine.negative_cache.discard(site.cache_key)
+                site.status = 'pending'
+                self.update_input_row_status(idx, 'Pending', 'pending')
+                retried += 1
+        
+        if not retried:
+            self.status_var.set("ℹ No not-found addresses to retry")
+            return
+        
+        self.status_var.set(f"↻ Retrying {retried} not-found address(es)...")
+        self.calculate_distances()
+    
+    def remove_selected(self):
+        """Remove selected addresses"""
+        # Find all selected rows
+        selected_indices = []
+        for idx, row_data in enumerate(self.input_rows):
+            if row_data['checkbox_var'].get():
+                selected_indices.append(idx)
+        
+        if not selected_indices:
+            messagebox.showinfo("No Selection", "Please select at least one address to remove by checking the checkbox(es).")
+            return
+        
+        # Confirm removal
+        count = len(selected_indices)
+        if not messagebox.askyesno("Confirm Removal", 
+                                   f"Remove {count} selected address(es)?"):
+            return
+        
+        # Remove in reverse order to maintain correct indices
+        for idx in reversed(selected_indices):
+            # Destroy the frame
+            self.input_rows[idx]['frame'].destroy()
+            # Remove from lists
+            del self.input_rows[idx]
+            del self.site_addresses[idx]
+        self.sites_version += 1
+        
+        self.status_var.set(f"✓ Removed {count} address(es). Total: {len(self.site_addresses)}")
+    
+    def clear_sites(self):
+        """Clear all site addresses"""
+        if self.site_addresses:
+            if messagebox.askyesno("Confirm Clear", 
+                                  f"Clear all {len(self.site_addresses)} addresses?"):
+                self.site_addresses = []
+                self.sites_version += 1
+                self.clear_input_rows()
+                self.status_var.set("✓ All addresses cleared")
+        else:
+            self.status_var.set("ℹ No addresses to clear")
+    
+    def geocode_address_incremental(self, address, max_retries=4, should_stop=None):
+        """Geocode address with incremental broader search strategy"""
+        return self.engine.geocode(address, max_retries, should_stop)
+    
+    def get_osrm_route(self, coord1, coord2):
+        """Get actual route distance and duration using the configured router"""
+        return self.engine.route(coord1, coord2)
+    
+    def calculate_distances_worker(self, job):
+        """Run one calculation job on the scheduler's worker thread"""
+        tech_addr, sites, sites_version = job.args
+        
+        def report(kind, data):
+            # Row numbers only match the input list the job was queued with
+            if kind != 'update_row' or sites_version == self.sites_version:
+                self.result_queue.put((kind, data))
+        
+        try:
+            if not self.cache_ready.is_set():
+                self.result_queue.put(('status', "⏳ Waiting for address cache to load..."))
+                while not self.cache_ready.wait(0.1):
+                    if job.token():
+                        return
+            
+            self.result_queue.put(('status', f"Geocoding technician address (job #{job.id})..."))
+            tech_lat, tech_lon, tech_level, tech_desc = self.geocode_address_incremental(tech_addr, should_stop=job.token)
+            
+            if job.token():
+                return
+            if not tech_lat:
+                self.result_queue.put(('error', "Could not geocode technician address"))
+                return
+            
+            self.result_queue.put(('progress', 0.05))
+            
+            outcome = self.engine.calculate(
+                (tech_lat, tech_lon),
+                list(sites),
+                report=report,
+                should_stop=job.token,
+                incremental=True
+            )
+            
+            if outcome is None:
+                return
+            
+            results, stats = outcome
+            stats['origin'] = (tech_lat, tech_lon)
+            self.result_queue.put(('results', (results, stats['origin'])))
+            self.result_queue.put(('complete', stats))
+            
+        except Exception as e:
+            self.result_queue.put(('error', f"Calculation error: {str(e)}"))
+    
+    def process_queue(self):
+        """Process messages from the worker thread"""
+        try:
+            while True:
+                try:
+                    msg_type, data = self.result_queue.get_nowait()
+                except Empty:
+                    break
+                
+                if msg_type == 'status':
+                    self.status_var.set(data)
+                elif msg_type == 'progress':
+                    self.progress.set(data)
+                elif msg_type == 'results':
+                    results, origin = data
+                    if len(self.all_results) and origin == self.result_origin:
+                        # Same technician location: merge into the ranked store, keeping the sort
+                        self.all_results = self.all_results.merged(results)
+                    else:
+                        self.all_results = ResultStore(results)
+                    self.apply_filters()
+                elif msg_type == 'complete':
+                    self.calculation_complete(data)
+                elif msg_type == 'job':
+                    self.job_changed(*data)
+                elif msg_type == 'error':
+                    self.handle_calculation_error(data)
+                elif msg_type == 'update_row':
+                    # Update the status of an input row
+                    row_index, status, tag = data
+                    self.update_input_row_status(row_index, status, tag)
+                elif msg_type == 'cache_loaded':
+                    self.apply_loaded_cache(data)
+                elif msg_type == 'export_complete':
+                    self.export_complete(*data)
+                elif msg_type == 'route_plan':
+                    self.show_route_plan(data)
+                elif msg_type == 'route_plan_error':
+                    self.plan_btn.configure(state="normal")
+                    messagebox.showerror("Route Planning Error", data)
+                    self.status_var.set(f"✗ Route planning failed: {data}")
+                elif msg_type == 'export_error':
+                    self.export_btn.configure(state="normal")
+                    messagebox.showerror("Export Error", data)
+                    self.status_var.set(f"✗ Export failed: {data}")
+        finally:
+            # Keep polling even when a handler fails; Tk reports the exception
+            self.root.after(100, self.process_queue)
+    
+    def job_changed(self, job, state):
+        """Show a calculation job's state change in the status and progress bars"""
+        queued = len(self.jobs.queued())
+        more = f" - {queued} more queued" if queued else ""
+        if state == 'queued':
+            self.status_var.set(f"⏳ Job #{job.id} queued for {job.label} ({self.jobs.ahead_of(job)} ahead)")
+        elif state == 'running':
+            self.progress.grid()
+            self.progress.set(0)
+            self.cancel_btn.configure(state="normal")
+            self.status_var.set(f"🚀 Job #{job.id} started for {job.label}{more}")
+        elif state == 'cancelled':
+            self.status_var.set(f"❌ Job #{job.id} cancelled{more}")
+        elif state == 'failed':
+            self.handle_calculation_error(f"Calculation error: {job.error}")
+        
+        if state in ('done', 'cancelled', 'failed') and self.jobs.current is None and not queued:
+            self.progress.grid_remove()
+            self.cancel_btn.configure(state="disabled")
+    
+    def cancel_calculation(self):
+        """Cancel the running job, or every queued job when none is running"""
+        if self.jobs.cancel() is None:
+            cancelled = self.jobs.cancel_all()
+            if cancelled:
+                self.status_var.set(f"❌ {cancelled} queued job(s) cancelled")
+    
+    def calculation_complete(self, stats=None):
+        """Handle calculation completion"""
+        # Save cache after calculation completes
+        self.save_cache()
+        
+        if stats:
+            self.result_origin = stats.get('origin')
+        
+        counts = self.all_results.tag_counts()
+        
+        summary_parts = []
+        if counts['success'] > 0:
+            summary_parts.append(f"{counts['success']} found")
+        if counts['cached'] > 0:
+            summary_parts.append(f"{counts['cached']} cached")
+        if counts['warning'] > 0:
+            summary_parts.append(f"{counts['warning']} broad")
+        if counts['error'] > 0:
+            summary_parts.append(f"{counts['error']} not found")
+        
+        summary = f"✓ Complete! " + ", ".join(summary_parts)
+        
+        if stats:
+            collapsed = stats['collapsed_geocodes'] + stats['collapsed_routes']
+            if collapsed:
+                summary += (f" ({stats['collapsed_geocodes']} geocode and "
+                            f"{stats['collapsed_routes']} route call(s) shared)")
+            if stats.get('matrix_routes'):
+                summary += f" - {stats['matrix_routes']} route(s) from depot matrix"
+            if stats.get('throttled'):
+                summary += f" - slowed down {stats['throttled']} time(s) for busy servers"
+            if stats.get('estimated_routes'):
+                reason = "router unavailable" if stats.get('router_down') else "no road route"
+                summary += f" - ≈ {stats['estimated_routes']} estimated ({reason})"
+            if stats.get('skipped_routes'):
+                summary += f" - ≈ {stats['skipped_routes']} far site(s) estimated without routing"
+            if stats.get('postcode_placed'):
+                summary += f" - {stats['postcode_placed']} placed by postcode"
+            if stats.get('reused'):
+                summary += f" - {stats['reused']} unchanged site(s) reused"
+            if stats.get('hedged_routes'):
+                hedging = stats['router_hedging']
+                summary += f" - {stats['hedged_routes']} slow route request(s) hedged, {stats['hedge_wins']} answered first"
+                if hedging['p99_ms'] is not None and hedging['unhedged_p99_ms'] is not None:
+                    summary += (f" (p99 {hedging['unhedged_p99_ms']:.0f} → {hedging['p99_ms']:.0f} ms, "
+                                f"{hedging['overhead']:.0%} extra requests)")
+        self.status_var.set(summary)
+    
+    def handle_calculation_error(self, error_msg):
+        """Handle calculation errors"""
+        messagebox.showerror("Calculation Error", error_msg)
+        self.status_var.set(f"✗ Error: {error_msg}")
+    
+    def apply_filters(self):
+        """Apply filters to results display"""
+        if not len(self.all_results):
+            return
+        
+        showing = self.render_results()
+        
+        total = len(self.all_results)
+        if showing < total:
+            self.status_var.set(f"🔍 Showing {showing} of {total} results (filtered)")
+        else:
+            self.status_var.set(f"📊 Showing all {total} results")
+    
+    def render_results(self):
+        """Show the filtered, sorted view of the result store, reusing row widgets"""
+        store = self.all_results
+        
+        filter_tags = {'success': 'success', 'cached': 'cached', 'broad': 'warning', 'not_found': 'error'}
+        tags = [tag for name, tag in filter_tags.items() if self.filter_vars[name].get()]
+        
+        rows = store.view(tags)
+        ranks = store.distance_ranks(rows)
+        
+        self.clear_cell_selection()
+        self.selection_start = None
+        self.last_clicked_cell = None
+        
+        for position, (idx, rank) in enumerate(zip(rows, ranks)):
+            if position >= len(self.results_rows):
+                self.add_result_row()
+            
+            tag = RESULT_TAGS[store.tag[idx]]
+            if store.distance[idx] == float('inf'):
+                distance, duration = 'N/A', 'N/A'
+            else:
+                # Format duration using the new format_duration method
+                distance = f"{store.distance[idx]:.2f}"
+                duration = self.format_duration(store.duration[idx])
+                if store.estimated[idx]:
+                    # Straight-line estimate, not a road route
+                    distance, duration = f"≈ {distance}", f"≈ {duration}"
+            
+            self.update_result_row(
+                position, int(rank), store.address[idx], store.suburb[idx], store.state[idx],
+                distance, duration, store.status[idx], tag
+            )
+        
+        # Hide pooled rows that are not needed for this view
+        for row in self.results_rows[len(rows):self.visible_result_rows]:
+            row['frame'].grid_remove()
+        self.visible_result_rows = len(rows)
+        self.visible_indices = rows
         
-        # Display menu at cursor position
-        try:
-            context_menu.tk_popup(event.x_root, event.y_root)
-        finally:
-            context_menu.grab_release()
+        self.update_sort_indicators()
+        return len(rows)
     
+    def calculate_distances(self):
+        """Queue a distance calculation for the technician address"""
+        tech_addr = self.tech_address.get("1.0", tk.END).strip()
+        
+        if not tech_addr:
+            messagebox.showwarning("Input Required", "Please enter the technician's address")
+            return
+        
+        if not self.site_addresses:
+            messagebox.showwarning("Input Required", "Please add at least one site address")
+            return
+        
+        # The job keeps its own copy of the sites, so the list can be edited while it waits
+        sites = tuple(site.copy() for site in self.site_addresses)
+        label = tech_addr.splitlines()[0]
+        self.jobs.submit(label, (tech_addr, sites, self.sites_version), self.priority_var.get().lower())
     
-    def handle_paste(self, event=None):
-        """Handle paste event"""
-        self.root.after(100, self.auto_process_hint)
-        return None
-    
-    def handle_tech_address_paste(self, event=None):
-        """Handle paste event for technician address with auto-formatting"""
-        self.root.after(100, self.auto_format_tech_address)
-        return None
+    def copy_results_smart(self):
+        """Smart copy - copies selected cells if any, otherwise copies all results"""
+        if self.selected_cells:
+            self.copy_selected_cells()
+        else:
+            self.copy_all_results()
     
-    def auto_format_tech_address(self, event=None):
-        """Auto-format the technician address by cleaning up whitespace, newlines, and tabs"""
-        current_text = self.tech_address.get("1.0", tk.END).strip()
-        
-        if not current_text:
+    def copy_all_results(self):
+        """Copy all results to clipboard"""
+        store = self.all_results
+        if not len(store):
+            messagebox.showinfo("No Results", "No results to copy")
             return
         
-        # Replace tabs with commas (for Excel column data)
-        formatted_text = current_text.replace('\t', ', ')
+        lines = ["Rank\tAddress\tSuburb\tState\tDistance (km)\tDuration (min)\tStatus"]
         
-        # Replace newlines with commas
-        formatted_text = formatted_text.replace('\n', ', ')
-        formatted_text = formatted_text.replace('\r', '')
+        # All results in the current sort order, ranked by distance
+        ranks = store.distance_ranks(store.order)
+        for rank, idx in zip(ranks, store.order):
+            prefix = f"{rank}\t{store.address[idx]}\t{store.suburb[idx]}\t{store.state[idx]}"
+            if store.distance[idx] == float('inf'):
+                line = f"{prefix}\tN/A\tN/A\t{store.status[idx]}"
+            else:
+                line = f"{prefix}\t{store.distance[idx]:.2f}\t{store.duration[idx]:.0f}\t{store.status[idx]}"
+            lines.append(line)
         
-        # Remove double commas
-        while ', , ' in formatted_text:
-            formatted_text = formatted_text.replace(', , ', ', ')
+        text = '\n'.join(lines)
+        self.root.clipboard_clear()
+        self.root.clipboard_append(text)
         
-        # Remove multiple consecutive whitespaces
-        formatted_text = re.sub(r'\s+', ' ', formatted_text)
+        messagebox.showinfo("Copied", f"Copied {len(store)} results to clipboard!")
+        self.status_var.set(f"✓ Copied {len(store)} results to clipboard")
+    
+    def export_results(self):
+        """Export all results to a CSV, Parquet or GeoJSON file on a background thread"""
+        if not len(self.all_results):
+            messagebox.showinfo("No Results", "No results to export")
+            return
         
-        # Remove spaces before commas
-        formatted_text = re.sub(r'\s+,', ',', formatted_text)
+        if self.export_thread and self.export_thread.is_alive():
+            messagebox.showwarning("Busy", "Export already in progress")
+            return
         
-        # Ensure single space after commas
-        formatted_text = re.sub(r',\s*', ', ', formatted_text)
+        path = filedialog.asksaveasfilename(
+            title="Export Results",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet"), ("GeoJSON", "*.geojson")]
+        )
+        if not path:
+            return
         
-        # Remove leading/trailing commas and whitespace
-        formatted_text = formatted_text.strip(', ').strip()
+        exporter = EXPORTERS.get(Path(path).suffix.lower())
+        if exporter is None:
+            messagebox.showwarning("Unsupported Format", "Please choose a .csv, .parquet or .geojson file")
+            return
         
-        # Only update if the text changed to avoid infinite loops
-        if formatted_text != current_text:
-            self.tech_address.delete("1.0", tk.END)
-            self.tech_address.insert("1.0", formatted_text)
-            self.status_var.set("✓ Technician address auto-formatted")
-    
-    def auto_process_hint(self):
-        """Show hint after pasting"""
-        pasted_text = self.paste_entry.get("1.0", tk.END).strip()
-        if pasted_text:
-            self.status_var.set("📋 Data pasted! Click 'Add' to process")
+        self.export_btn.configure(state="disabled")
+        self.status_var.set(f"💾 Exporting {len(self.all_results)} results...")
+        self.export_thread = threading.Thread(
+            target=self.export_worker,
+            args=(exporter, self.all_results, path),
+            daemon=True
+        )
+        self.export_thread.start()
     
-    def parse_address_line(self, line):
-        """Parse a single line of address data"""
-        line = line.strip()
-        if not line:
-            return None
+    def export_worker(self, exporter, store, path):
+        """Write the export file in chunks, reporting progress through the result queue"""
+        total = len(store)
         
-        # Try tab-separated first (Excel default)
-        if '\t' in line:
-            parts = [p.strip() for p in line.split('\t') if p.strip()]
-            if len(parts) >= 3:
-                return {'address': parts[0], 'suburb': parts[1], 'state': parts[2]}
-        
-        # Try comma-separated
-        if ',' in line:
-            parts = [p.strip() for p in line.split(',') if p.strip()]
-            if len(parts) >= 3:
-                return {
-                    'address': ', '.join(parts[:-2]),
-                    'suburb': parts[-2],
-                    'state': parts[-1]
-                }
-            elif len(parts) == 2:
-                return {'address': '', 'suburb': parts[0], 'state': parts[1]}
-        
-        # Try pipe-separated
-        if '|' in line:
-            parts = [p.strip() for p in line.split('|') if p.strip()]
-            if len(parts) >= 3:
-                return {'address': parts[0], 'suburb': parts[1], 'state': parts[2]}
-        
-        # Single line - try to detect full address
-        parts = [p.strip() for p in line.split(',')]
-        if len(parts) >= 2:
-            last_part = parts[-1].strip()
-            state_match = re.match(r'^([A-Z]{2,3})(\s+\d{4})?$', last_part)
-            if state_match:
-                state = state_match.group(1)
-                suburb = parts[-2] if len(parts) >= 2 else ''
-                address = ', '.join(parts[:-2]) if len(parts) > 2 else ''
-                return {'address': address, 'suburb': suburb, 'state': state}
+        def progress(written):
+            self.result_queue.put(('status', f"💾 Exporting... {written}/{total} rows"))
         
-        return None
+        try:
+            start = time.perf_counter()
+            written = exporter(store, path, progress)
+            self.result_queue.put(('export_complete', (path, written, time.perf_counter() - start)))
+        except ImportError as e:
+            self.result_queue.put(('export_error', f"Parquet export requires pyarrow ({e})"))
+        except Exception as e:
+            self.result_queue.put(('export_error', str(e)))
     
-    def process_pasted_data(self):
-        """Process pasted data"""
-        pasted_text = self.paste_entry.get("1.0", tk.END).strip()
+    def export_complete(self, path, written, elapsed):
+        """Handle export completion"""
+        self.export_btn.configure(state="normal")
+        self.status_var.set(f"✓ Exported {written} results to {Path(path).name} in {elapsed:.1f}s")
+    
+    def plan_day_route(self):
+        """Plan a visiting order for the selected result rows on a background thread"""
+        store = self.all_results
+        rows = sorted({row for row, col in self.selected_cells if 1 <= row <= self.visible_result_rows})
+        indices = [int(self.visible_indices[row - 1]) for row in rows]
+        
+        # Unresolved sites cannot be visited
+        indices = [i for i in indices if store.distance[i] != float('inf')]
+        if not indices:
+            messagebox.showinfo("No Selection", "Select the result rows to visit, then plan the route")
+            return
         
-        if not pasted_text:
-            messagebox.showinfo("No Data", "Please paste address data first")
+        if self.result_origin is None:
+            messagebox.showinfo("No Start", "Calculate distances first to set the starting point")
             return
         
-        lines = pasted_text.split('\n')
-        added_count = 0
-        skipped_count = 0
+        if self.plan_thread and self.plan_thread.is_alive():
+            messagebox.showwarning("Busy", "Route planning already in progress")
+            return
         
-        for line in lines:
-            parsed = self.parse_address_line(line)
+        self.plan_btn.configure(state="disabled")
+        self.status_var.set(f"🗺 Planning route through {len(indices)} stop(s)...")
+        self.plan_thread = threading.Thread(
+            target=self.plan_route_worker,
+            args=(store, self.result_origin, indices),
+            daemon=True
+        )
+        self.plan_thread.start()
+    
+    def plan_route_worker(self, store, origin, indices):
+        """Fetch the pairwise road matrix for the stops and optimise the visiting order"""
+        try:
+            start = time.perf_counter()
+            points = [tuple(origin)] + [(float(store.lat[i]), float(store.lon[i])) for i in indices]
+            distances, durations = self.engine.pairwise_matrix(points)
             
-            if parsed and (parsed['address'] or parsed['suburb']) and parsed['state']:
-                address = parsed['address']
-                suburb = parsed['suburb']
-                state = parsed['state']
-                
-                is_duplicate = any(
-                    addr['address'] == address and 
-                    addr['suburb'] == suburb and 
-                    addr['state'] == state
-                    for addr in self.site_addresses
-                )
-                
-                if not is_duplicate:
-                    cache_key = f"{address}, {suburb}, {state}".lower()
-                    is_cached = cache_key in self.geocode_cache
-                    
-                    status = '💾 Cached' if is_cached else 'Pending'
-                    tag = 'cached' if is_cached else 'pending'
-                    
-                    self.add_input_row(status, address, suburb, state, tag)
-                    
-                    site_data = {
-                        'address': address,
-                        'suburb': suburb,
-                        'state': state,
-                        'status': 'pending'
-                    }
-                    
-                    if is_cached:
-                        cached_data = self.geocode_cache[cache_key]
-                        site_data.update(cached_data)
-                        site_data['status'] = 'cached'
-                    
-                    self.site_addresses.append(site_data)
-                    added_count += 1
-                else:
-                    skipped_count += 1
+            order, total_duration = plan_route(durations)
+            tour = [0] + order
+            total_distance = float(distances[tour[:-1], tour[1:]].sum())
+            
+            # Drive time when visiting in ranked (nearest-first) order, for comparison
+            ranked = [0] + [pos + 1 for pos in sorted(range(len(indices)), key=lambda p: store.distance[indices[p]])]
+            ranked_duration = route_cost(durations, ranked)
+            
+            legs = []
+            for prev, stop in zip(tour[:-1], tour[1:]):
+                legs.append((indices[stop - 1], float(distances[prev, stop]), float(durations[prev, stop])))
+            
+            self.result_queue.put(('route_plan', {
+                'legs': legs,
+                'total_distance': total_distance,
+                'total_duration': total_duration,
+                'ranked_duration': ranked_duration,
+                'elapsed': time.perf_counter() - start
+            }))
+        except Exception as e:
+            self.result_queue.put(('route_plan_error', str(e)))
+    
+    def show_route_plan(self, plan):
+        """Show the planned visiting order with leg and total drive times"""
+        self.plan_btn.configure(state="normal")
+        store = self.all_results
+        total = self.format_duration(plan['total_duration'])
+        ranked = self.format_duration(plan['ranked_duration'])
+        
+        self.status_var.set(f"🗺 Planned {len(plan['legs'])} stop(s): {total} total drive "
+                            f"(ranked order: {ranked}) in {plan['elapsed']:.1f}s")
+        
+        lines = [
+            f"Total drive: {total} ({plan['total_distance']:.1f} km)",
+            f"Ranked order: {ranked}",
+            ""
+        ]
+        elapsed_minutes = 0.0
+        for stop, (idx, distance, duration) in enumerate(plan['legs'], start=1):
+            elapsed_minutes += duration
+            lines.append(f"{stop:>3}. {store.address[idx]}, {store.suburb[idx]} {store.state[idx]}")
+            lines.append(f"     +{distance:.1f} km, {self.format_duration(duration)} "
+                         f"(at {self.format_duration(elapsed_minutes)})")
+        
+        window = ctk.CTkToplevel(self.root)
+        window.title("Planned Route")
+        window.geometry("520x480")
+        window.transient(self.root)
+        
+        textbox = ctk.CTkTextbox(window, font=ctk.CTkFont(family="Consolas", size=11), wrap="none")
+        textbox.pack(fill="both", expand=True, padx=16, pady=(16, 8))
+        textbox.insert("1.0", '\n'.join(lines))
+        textbox.configure(state="disabled")
+        
+        def copy_plan():
+            self.root.clipboard_clear()
+            self.root.clipboard_append('\n'.join(lines))
+            self.status_var.set("✓ Copied planned route to clipboard")
+        
+        ctk.CTkButton(
+            window,
+            text="📋 Copy Route",
+            command=copy_plan,
+            width=140,
+            height=32,
+            corner_radius=8,
+            fg_color="#16a085",
+            hover_color="#138d75",
+            font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold")
+        ).pack(pady=(0, 16))
+
+
+STARTUP_IMPORTS = ['tkinter', 'customtkinter', 'requests', 'geopy.distance', 'numpy']
+
+
+def measure_import_time(module):
+    """Measure the cumulative import time of a module in a fresh interpreter (ms)"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    # Lines look like: "import time:  self [us] | cumulative | imported package"
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    return None
+
+
+def run_startup_benchmark(runs=3):
+    """Benchmark cold start: module import costs and window initialisation phases"""
+    print("Import costs (fresh interpreter, cumulative):")
+    for module in STARTUP_IMPORTS:
+        samples = [measure_import_time(module) for _ in range(runs)]
+        samples = [s for s in samples if s is not None]
+        if samples:
+            deferred = "" if module in ('tkinter', 'customtkinter') else "  (deferred to first use)"
+            print(f"  {module:<18} {min(samples):8.1f} ms{deferred}")
+        else:
+            print(f"  {module:<18}      n/a  (not installed)")
+    
+    if CACHE_FILE.exists():
+        size_mb = CACHE_FILE.stat().st_size / (1024 * 1024)
+        print(f"\nCache file: {CACHE_FILE} ({size_mb:.1f} MB)")
+    
+    print("\nInitialisation phases (best of runs):")
+    phases = {}
+    for _ in range(runs):
+        try:
+            start = time.perf_counter()
+            app = ctk.CTk()
+            root_ready = time.perf_counter()
+            calculator = AddressDistanceCalculator(app)
+            init_done = time.perf_counter()
+            app.update()
+            painted = time.perf_counter()
+            calculator.cache_ready.wait()
+            cache_done = time.perf_counter()
+            app.destroy()
+        except tk.TclError as e:
+            print(f"  skipped - no display available ({e})")
+            return
         
-        self.paste_entry.delete("1.0", tk.END)
+        timings = {
+            'create root window': root_ready - start,
+            'build UI (__init__)': init_done - root_ready,
+            'first paint': painted - init_done,
+            'time to window painted': painted - start,
+            'background cache load': cache_done - painted,
+        }
+        for name, value in timings.items():
+            phases[name] = min(phases.get(name, value), value)
+    
+    for name, value in phases.items():
+        print(f"  {name:<24} {value * 1000:8.1f} ms")
+
+
+UI_BENCH_SIZES = '100,1000,10000,50000'
+
+# Input rows added before the first paint is timed, about one screenful
+UI_BENCH_FIRST_PAGE = 30
+
+# Report columns: (key, heading)
+UI_BENCH_METRICS = [
+    ('first_paint_ms', 'first paint'),
+    ('input_fill_ms', 'input fill'),
+    ('results_fill_ms', 'results fill'),
+    ('filter_toggle_ms', 'filter'),
+    ('select_all_ms', 'select all'),
+    ('copy_ms', 'copy'),
+    ('theme_switch_ms', 'theme'),
+    ('widgets', 'widgets'),
+    ('rss_mb', 'RSS MB'),
+]
+
+
+@contextmanager
+def virtual_display():
+    """Run Tk on a private Xvfb display when there is no display (Linux) - yields the display name
+    
+    Yields None when there is no display and Xvfb is missing or fails to start.
+    """
+    import shutil
+    
+    if os.environ.get('DISPLAY') or not sys.platform.startswith('linux') or not shutil.which('Xvfb'):
+        yield os.environ.get('DISPLAY')
+        return
+    
+    number = next(n for n in range(99, 200)
+                  if not Path(f"/tmp/.X11-unix/X{n}").exists() and not Path(f"/tmp/.X{n}-lock").exists())
+    display = f":{number}"
+    socket_path = Path(f"/tmp/.X11-unix/X{number}")
+    proc = subprocess.Popen(['Xvfb', display, '-screen', '0', '1920x1080x24', '-nolisten', 'tcp'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 10
+        while not socket_path.exists() and time.time() < deadline and proc.poll() is None:
+            time.sleep(0.05)
+        if proc.poll() is not None or not socket_path.exists():
+            print(f"⚠ Xvfb did not start on {display}")
+            yield None
+            return
+        os.environ['DISPLAY'] = display
+        yield display
+    finally:
+        if os.environ.get('DISPLAY') == display:
+            del os.environ['DISPLAY']
+        proc.terminate()
+        proc.wait()
+
+
+@contextmanager
+def quiet_dialogs():
+    """Turn information dialogs into no-ops so benchmarks run unattended"""
+    originals = messagebox.showinfo, messagebox.showwarning
+    messagebox.showinfo = messagebox.showwarning = lambda *args, **kwargs: 'ok'
+    try:
+        yield
+    finally:
+        messagebox.showinfo, messagebox.showwarning = originals
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB, or None where it cannot be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
         
-        if added_count > 0:
-            status_msg = f"✓ Added {added_count} address(es)"
-            if skipped_count > 0:
-                status_msg += f" ({skipped_count} duplicate(s) skipped)"
-            status_msg += f". Total: {len(self.site_addresses)}"
-            self.status_var.set(status_msg)
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+    except ImportError:
+        return None
+
+
+def count_widgets(widget):
+    """Number of Tk widgets under (and including) widget"""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def synthetic_results(n, rng):
+    """Sites and result records for the UI benchmark, with a realistic mix of tags"""
+    statuses = [('✓ Found (exact)', 'success'), ('💾 Cached', 'cached'),
+                ('⚠ Broad (suburb)', 'warning'), ('✗ Not Found', 'error')]
+    sites, records = [], []
+    for i in range(n):
+        site = Site(f"{i} Example St", f"Suburb {i % 5000}", rng.choice(['NSW', 'VIC', 'QLD']), 'cached')
+        status, tag = statuses[rng.choices(range(4), weights=(60, 30, 8, 2))[0]]
+        if tag == 'error':
+            records.append(ResultRecord(site, float('inf'), float('inf'), status, tag, 999))
         else:
-            if skipped_count > 0:
-                messagebox.showinfo("Duplicates", 
-                                  f"All {skipped_count} address(es) already exist in the list.")
-                self.status_var.set(f"ℹ {skipped_count} duplicate(s) skipped")
-            else:
-                messagebox.showwarning("Invalid Format", 
-                                     "No valid addresses found.\n\n" +
-                                     "Supported formats:\n" +
-                                     "• Excel columns (tab-separated): Address | Suburb | State\n" +
-                                     "• Comma-separated: Address, Suburb, State\n" +
-                                     "• Full address: Street, Suburb, STATE 1234")
-                self.status_var.set("⚠ No valid addresses found")
+            site.lat, site.lon = rng.uniform(-38, -28), rng.uniform(145, 153)
+            level = 3 if tag == 'warning' else 0
+            records.append(ResultRecord(site, rng.uniform(1, 900), rng.uniform(2, 600), status, tag, level))
+        sites.append(site)
+    return sites, records
+
+
+def measure_ui(n, rng):
+    """Fill a fresh window with n synthetic rows and time the table operations - returns a metrics dict"""
+    app = ctk.CTk()
+    calculator = AddressDistanceCalculator(app)
+    # The cache loader is started from an idle callback, so keep Tk running until it finishes
+    while not calculator.cache_ready.wait(0.05):
+        app.update()
+    app.update()
+    sites, records = synthetic_results(n, rng)
     
-    def remove_selected(self):
-        """Remove selected addresses"""
-        # Find all selected rows
-        selected_indices = []
-        for idx, row_data in enumerate(self.input_rows):
-            if row_data['checkbox_var'].get():
-                selected_indices.append(idx)
+    def timed(action):
+        start = time.perf_counter()
+        action()
+        app.update()
+        return (time.perf_counter() - start) * 1000
+    
+    def add_rows(rows):
+        for site in rows:
+            calculator.add_input_row('💾 Cached', site.address, site.suburb, site.state, 'cached')
+    
+    metrics = {'rows': n}
+    try:
+        with quiet_dialogs():
+            metrics['first_paint_ms'] = timed(lambda: add_rows(sites[:UI_BENCH_FIRST_PAGE]))
+            metrics['input_fill_ms'] = metrics['first_paint_ms'] + timed(lambda: add_rows(sites[UI_BENCH_FIRST_PAGE:]))
+            
+            def show_results():
+                calculator.all_results = ResultStore(records)
+                calculator.apply_filters()
+            metrics['results_fill_ms'] = timed(show_results)
+            
+            # Hide and show the cached rows, the largest group after found ones
+            toggles = []
+            for shown in (False, True):
+                calculator.filter_vars['cached'].set(shown)
+                toggles.append(timed(calculator.apply_filters))
+            metrics['filter_toggle_ms'] = sum(toggles) / len(toggles)
+            
+            metrics['select_all_ms'] = timed(calculator.select_all_results)
+            metrics['copy_ms'] = timed(calculator.copy_selected_cells)
+            metrics['theme_switch_ms'] = sum(timed(calculator.toggle_theme) for _ in range(2)) / 2
+            metrics['widgets'] = count_widgets(app)
+            metrics['rss_mb'] = current_rss_mb()
+    finally:
+        calculator.jobs.cancel_all()
+        app.destroy()
+    return metrics
+
+
+def format_ui_metric(key, value):
+    if value is None:
+        return 'n/a'
+    return f"{value:,}" if key == 'widgets' else f"{value:,.1f}"
+
+
+def run_ui_benchmark(sizes, output=None, baseline=None):
+    """Time the GUI with synthetic tables of each size and write a JSON report
+    
+    Runs under a private Xvfb display when none is available. With a baseline
+    report from an earlier release, each metric is also shown as a change.
+    """
+    import platform
+    import random
+    
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                 cwd=Path(__file__).parent).stdout.strip() or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'tk': str(tk.TkVersion),
+        'customtkinter': getattr(ctk, '__version__', None),
+        'results': [],
+    }
+    previous = {}
+    if baseline:
+        previous = {r['rows']: r for r in read_json_file(baseline).get('results', [])}
+    
+    with virtual_display() as display:
+        print(f"UI benchmark on display {display or 'n/a'}")
+        print(f"{'rows':>7} " + " ".join(f"{heading:>12}" for _, heading in UI_BENCH_METRICS))
+        for n in sizes:
+            try:
+                metrics = measure_ui(n, random.Random(n))
+            except tk.TclError as e:
+                print(f"⚠ No display available ({e}) - set DISPLAY or install Xvfb")
+                sys.exit(1)
+            report['results'].append(metrics)
+            print(f"{n:>7} " + " ".join(f"{format_ui_metric(key, metrics[key]):>12}" for key, _ in UI_BENCH_METRICS))
+            
+            old = previous.get(n)
+            if old:
+                changes = []
+                for key, _ in UI_BENCH_METRICS:
+                    if metrics[key] is not None and old.get(key):
+                        changes.append(f"{metrics[key] / old[key] - 1:>+12.0%}")
+                    else:
+                        changes.append(f"{'n/a':>12}")
+                print(f"{'vs base':>7} " + " ".join(changes))
+    
+    output = Path(output or f"ui-bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    write_json_atomic(output, report)
+    print(f"✓ Report written to {output}")
+
+
+def build_dict_records(inputs):
+    """Build sites, cache and results in the original one-dict-per-record layout"""
+    sites, cache, results = [], {}, []
+    for address, suburb, state, key, lat, lon, distance, duration in inputs:
+        sites.append({'address': address, 'suburb': suburb, 'state': state, 'status': 'cached',
+                      'lat': lat, 'lon': lon, 'match_level': 0, 'match_desc': 'exact'})
+        cache[key] = {'lat': lat, 'lon': lon, 'match_level': 0, 'match_desc': 'exact'}
+        results.append({'address': address, 'suburb': suburb, 'state': state,
+                        'distance': distance, 'duration': duration, 'status': '💾 Cached',
+                        'tag': 'cached', 'match_level': 0})
+    return sites, cache, results
+
+
+def build_slotted_records(inputs):
+    """Build sites, cache and results using the compact record types"""
+    sites, cache, results = [], {}, []
+    for address, suburb, state, key, lat, lon, distance, duration in inputs:
+        entry = CacheEntry(lat, lon)
+        site = Site(address, suburb, state, 'cached')
+        site.apply_location(entry)
+        sites.append(site)
+        cache[key] = entry
+        results.append(ResultRecord(site, distance, duration, '💾 Cached', 'cached', 0))
+    return sites, cache, results
+
+
+def run_memory_benchmark(sizes):
+    """Compare memory used by the dict layout and the compact record layout"""
+    import tracemalloc
+    import random
+    
+    print(f"{'records':>10} {'dict layout':>14} {'slotted':>14} {'saving':>8}")
+    for n in sizes:
+        # Strings and floats are shared by both layouts, so build them up front
+        rng = random.Random(n)
+        inputs = []
+        for i in range(n):
+            address, suburb, state = f"{i} Example St", f"Suburb {i % 5000}", "NSW"
+            inputs.append((address, suburb, state, f"{address}, {suburb}, {state}".lower(),
+                           rng.uniform(-44, -10), rng.uniform(113, 154),
+                           rng.uniform(0, 900), rng.uniform(0, 600)))
+        
+        usage = {}
+        for name, builder in (('dict', build_dict_records), ('slotted', build_slotted_records)):
+            tracemalloc.start()
+            records = builder(inputs)
+            usage[name] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del records
+        
+        saving = 1 - usage['slotted'] / usage['dict']
+        print(f"{n:>10} {usage['dict'] / 1e6:>11.1f} MB {usage['slotted'] / 1e6:>11.1f} MB {saving:>7.0%}")
+
+
+CACHE_EXPORT_COLUMNS = ['key', 'lat', 'lon', 'match_level', 'match_desc', 'created', 'last_access', 'hits']
+
+
+def read_table_rows(path, batch_size=50000):
+    """Yield rows of a CSV or Parquet file as dicts with lower-case column names"""
+    if Path(path).suffix.lower() == '.parquet':
+        import pyarrow.parquet as pq
+        
+        for batch in pq.ParquetFile(str(path)).iter_batches(batch_size=batch_size):
+            for row in batch.to_pylist():
+                yield {name.strip().lower(): value for name, value in row.items()}
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield {name.strip().lower(): value for name, value in row.items() if name}
+
+
+def cache_import_entries(rows, skipped):
+    """Yield (canonical key, CacheEntry) from rows of known coordinates
+    
+    A row is keyed by its 'key' column (as written by cache export), by
+    address, suburb and state columns, or by a full address line in the address
+    column. Coordinates come from lat/lon (or latitude/longitude, long). Rows
+    that cannot be keyed or located are counted in skipped[0].
+    """
+    for row in rows:
+        lat = row.get('lat', row.get('latitude'))
+        lon = row.get('lon', row.get('longitude', row.get('long')))
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            skipped[0] += 1
+            continue
+        # float() accepts 'nan' and 'inf', which would poison distances
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            skipped[0] += 1
+            continue
+        
+        if row.get('key'):
+            key = canonical_key(row['key'])
+        elif row.get('suburb') and row.get('state'):
+            key = Site(row.get('address') or '', row['suburb'], row['state']).cache_key
+        else:
+            site = parse_address_line(row.get('address') or '')
+            key = site.cache_key if site else None
+        if not key:
+            skipped[0] += 1
+            continue
         
-        if not selected_indices:
-            messagebox.showinfo("No Selection", "Please select at least one address to remove by checking the checkbox(es).")
+        # Exported entries keep their metadata; new ones count as exact matches made now
+        try:
+            created = float(row['created']) if row.get('created') else None
+            last_access = float(row['last_access']) if row.get('last_access') else None
+            match_level = int(row.get('match_level') or 0)
+            hits = int(row.get('hits') or 0)
+        except (TypeError, ValueError):
+            skipped[0] += 1
+            continue
+        if not all(math.isfinite(t) for t in (created, last_access) if t is not None):
+            skipped[0] += 1
+            continue
+        yield key, CacheEntry(lat, lon, match_level, row.get('match_desc') or 'imported',
+                              created, last_access, hits)
+
+
+def import_cache_file(cache, path, skipped, chunk_size=50000):
+    """Stream a CSV or Parquet file of known coordinates into the cache - returns (rows, new keys)"""
+    entries = cache_import_entries(read_table_rows(path, chunk_size), skipped)
+    imported = added = 0
+    while True:
+        chunk = list(itertools.islice(entries, chunk_size))
+        if not chunk:
+            break
+        added += cache.put_many(chunk)
+        imported += len(chunk)
+    return imported, added
+
+
+def export_cache_file(cache, path, chunk_size=50000):
+    """Write every cache entry to a CSV or Parquet file that cache import reads back - returns the count"""
+    entries = cache.items()
+    chunks = ([[key, e.lat, e.lon, e.match_level, e.match_desc, round(e.created), round(e.last_access), e.hits]
+               for key, e in entries[start:start + chunk_size]]
+              for start in range(0, len(entries), chunk_size))
+    
+    if Path(path).suffix.lower() == '.parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        schema = pa.schema([
+            ('key', pa.string()), ('lat', pa.float64()), ('lon', pa.float64()), ('match_level', pa.int32()),
+            ('match_desc', pa.string()), ('created', pa.int64()), ('last_access', pa.int64()), ('hits', pa.int64())
+        ])
+        with pq.ParquetWriter(str(path), schema) as writer:
+            for rows in chunks:
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                    schema=schema
+                ))
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CACHE_EXPORT_COLUMNS)
+            for rows in chunks:
+                writer.writerows(rows)
+    return len(entries)
+
+
+def key_hit_report(cache, sites):
+    """Distinct sites and cache hits for an address list, with plain lower-case and canonical keys
+    
+    The cache must hold keys as stored on disk (loaded with rekey=None), so the plain
+    keys are not compared against entries that loading already converted.
+    """
+    # The key format before canonical keys: no postcode, only lower-cased
+    legacy_keys = [f"{site.address}, {site.suburb}, {site.state}".lower() for site in sites]
+    canonical_keys = [site.cache_key for site in sites]
+    converted = {key: canonical_key(key) for key in cache.entries}
+    cached = set(converted.values())
+    return {
+        'cache_keys': len(cache),
+        'cache_canonical_keys': sum(1 for key, canonical in converted.items() if key == canonical),
+        'sites': len(sites),
+        'legacy_distinct': len(set(legacy_keys)),
+        'canonical_distinct': len(set(canonical_keys)),
+        'legacy_hits': sum(1 for key in legacy_keys if key in cache),
+        'canonical_hits': sum(1 for key in canonical_keys if key in cached)
+    }
+
+
+def run_cache_command(args):
+    """Command-line cache maintenance: stats, compact, import, export or a key hit-rate report"""
+    config = load_config()
+    cache = create_geocode_cache(config)
+    if args.action == 'report':
+        # Compare both key schemes against the keys as stored, not converted on load
+        cache.rekey = None
+    if CACHE_FILE.exists():
+        cache.load(CACHE_FILE)
+    
+    if args.action == 'stats':
+        print(format_cache_stats(cache.stats(CACHE_FILE)))
+    elif args.action == 'compact':
+        merged = cache.canonicalise(canonical_key)
+        evicted = cache.compact()
+        cache.save(CACHE_FILE)
+        
+        negative_cache = NegativeCache(config.get('negative_cache_ttl_days', NEGATIVE_CACHE_TTL_DAYS) * 86400)
+        negative_cache.load(NEGATIVE_CACHE_FILE)
+        negative_cache.save(NEGATIVE_CACHE_FILE)
+        
+        print(f"✓ Compacted cache: {merged} address variant(s) merged, {evicted} evicted, {len(cache)} kept")
+        print(format_cache_stats(cache.stats(CACHE_FILE)))
+    elif args.action == 'import':
+        if not args.path:
+            print("⚠ cache import needs a CSV or Parquet file")
+            sys.exit(1)
+        start = time.perf_counter()
+        skipped = [0]
+        evictions = cache.evictions
+        imported, added = import_cache_file(cache, args.path, skipped)
+        evicted = cache.evictions - evictions
+        cache.save(CACHE_FILE)
+        
+        # Known coordinates override earlier failed lookups
+        negative_cache = NegativeCache(config.get('negative_cache_ttl_days', NEGATIVE_CACHE_TTL_DAYS) * 86400)
+        negative_cache.load(NEGATIVE_CACHE_FILE)
+        for key in [key for key in negative_cache.entries if key in cache]:
+            negative_cache.discard(key)
+        negative_cache.save(NEGATIVE_CACHE_FILE)
+        
+        print(f"✓ Imported {imported} addresses ({added} new) in {time.perf_counter() - start:.1f}s - "
+              f"{len(cache)} cached")
+        if skipped[0]:
+            print(f"⚠ {skipped[0]} row(s) without an address or valid coordinates skipped")
+        if evicted:
+            print(f"⚠ {evicted} entries evicted by the cache caps - raise cache_max_entries/cache_max_mb, "
+                  f"or use 'store build' for national address files")
+    elif args.action == 'export':
+        if not args.path:
+            print("⚠ cache export needs an output .csv or .parquet file")
+            sys.exit(1)
+        count = export_cache_file(cache, args.path)
+        print(f"✓ Exported {count} cached addresses to {args.path}")
+    elif args.action == 'report':
+        if not args.path:
+            print("⚠ cache report needs an address list file")
+            sys.exit(1)
+        with open(args.path, encoding='utf-8') as f:
+            sites = [site for site in map(parse_address_line, f) if site]
+        report = key_hit_report(cache, sites)
+        total = max(report['sites'], 1)
+        print(f"Cache file:   {report['cache_keys']:,} keys as stored, "
+              f"{report['cache_canonical_keys']:,} already in canonical form")
+        print(f"Address list: {report['sites']:,} sites")
+        print(f"  Distinct sites:  {report['legacy_distinct']:,} by plain key, "
+              f"{report['canonical_distinct']:,} by canonical key")
+        print(f"  Cache hit rate:  {report['legacy_hits'] / total:.1%} by plain key, "
+              f"{report['canonical_hits'] / total:.1%} by canonical key")
+
+
+BATCH_SHARD_COLUMNS = EXPORT_COLUMNS[1:]
+
+# Per-process engine used by batch workers, set up by init_batch_worker
+_batch_engine = None
+
+
+def init_batch_worker(config, geocoder_limits, router_limits):
+    """Process pool initializer: build an engine that shares the pool's rate limits"""
+    import multiprocessing.util
+    
+    global _batch_engine
+    _batch_engine = DistanceEngine(config)
+    _batch_engine.geocoder.use_limits(geocoder_limits)
+    _batch_engine.router.use_limits(router_limits)
+    _batch_engine.load_caches()
+    # Save once as the worker exits rather than rewriting the cache files after every shard
+    multiprocessing.util.Finalize(None, save_batch_worker_caches, exitpriority=10)
+
+
+def save_batch_worker_caches():
+    """Worker exit hook: merge this worker's new cache entries and speed observations into the files"""
+    _batch_engine.save_caches(new_only=True)
+
+
+def run_batch_shard(shard_index, lines, origin, shard_dir):
+    """Parse, geocode and route one shard; writes a distance-sorted shard CSV
+    
+    Returns (shard path, result count, unparsed line count, stats). Caches are saved
+    when the worker exits (see save_batch_worker_caches), not per shard.
+    """
+    engine = _batch_engine
+    sites = []
+    for line in lines:
+        site = parse_address_line(line)
+        if site:
+            engine.apply_cached(site)
+            sites.append(site)
+    
+    results, stats = engine.calculate(origin, sites)
+    
+    path = Path(shard_dir) / f"shard-{shard_index:05d}.csv"
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for rows in iter_export_chunks(ResultStore(results)):
+            # Shard rank is meaningless once merged - the merge assigns global ranks
+            writer.writerows(['' if v is None else v for v in row[1:]] for row in rows)
+    return str(path), len(results), len(lines) - len(sites), stats
+
+
+def merge_batch_shards(shard_paths, output_path):
+    """K-way merge distance-sorted shard CSVs into one ranked CSV - returns row count"""
+    distance_col = BATCH_SHARD_COLUMNS.index('distance_km')
+    
+    def distance_key(row):
+        return float(row[distance_col]) if row[distance_col] else float('inf')
+    
+    files = [open(p, newline='', encoding='utf-8') for p in shard_paths]
+    try:
+        readers = [csv.reader(f) for f in files]
+        with open(output_path, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out)
+            writer.writerow(EXPORT_COLUMNS)
+            rank = 0
+            for rank, row in enumerate(heapq.merge(*readers, key=distance_key), start=1):
+                writer.writerow([rank] + row)
+        return rank
+    finally:
+        for f in files:
+            f.close()
+
+
+class DistanceAPI:
+    """JSON endpoints of the local server mode over one shared, warm DistanceEngine
+    
+    Geocoding and routing from concurrent requests go through RequestBatchers, so
+    clients arriving within the batch window share one geocoding cascade and one
+    set of table requests per origin.
+    """
+    MAX_MATRIX_POINTS = 500
+    
+    def __init__(self, engine, window=0.02):
+        self.engine = engine
+        self.geocode_batcher = RequestBatcher(self.geocode_batch, window)
+        self.route_batcher = RequestBatcher(self.route_batch, window)
+        self.requests = 0
+        self.lock = threading.Lock()
+    
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+    
+    @staticmethod
+    def list_field(body, name):
+        """body[name], which must be a list - raises ValueError otherwise"""
+        if not isinstance(body, dict):
+            raise ValueError("body must be a JSON object")
+        if name not in body:
+            raise ValueError(f"missing '{name}'")
+        value = body[name]
+        if not isinstance(value, list):
+            raise ValueError(f"'{name}' must be a list")
+        return value
+    
+    @staticmethod
+    def check_point(value, label):
+        """Raise ValueError unless value is an address string or a [lat, lon] pair of numbers"""
+        if isinstance(value, str):
             return
-        
-        # Confirm removal
-        count = len(selected_indices)
-        if not messagebox.askyesno("Confirm Removal", 
-                                   f"Remove {count} selected address(es)?"):
+        if (isinstance(value, list) and len(value) == 2
+                and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
+                and -90 <= value[0] <= 90 and -180 <= value[1] <= 180):
             return
-        
-        # Remove in reverse order to maintain correct indices
-        for idx in reversed(selected_indices):
-            # Destroy the frame
-            self.input_rows[idx]['frame'].destroy()
-            # Remove from lists
-            del self.input_rows[idx]
-            del self.site_addresses[idx]
-        
-        self.status_var.set(f"✓ Removed {count} address(es). Total: {len(self.site_addresses)}")
+        raise ValueError(f"{label} must be an address string or a [lat, lon] pair, got {json.dumps(value)}")
     
-    def clear_sites(self):
-        """Clear all site addresses"""
-        if self.site_addresses:
-            if messagebox.askyesno("Confirm Clear", 
-                                  f"Clear all {len(self.site_addresses)} addresses?"):
-                self.site_addresses = []
-                self.clear_input_rows()
-                self.status_var.set("✓ All addresses cleared")
-        else:
-            self.status_var.set("ℹ No addresses to clear")
+    @staticmethod
+    def query_for(line):
+        """(cache key, geocoder query) for an address line; free text is used as-is"""
+        site = parse_address_line(line)
+        if site:
+            return site.cache_key, site.full_address
+        return line.strip().lower(), line.strip()
     
-    def geocode_address_incremental(self, address, max_retries=4):
-        """Geocode address with incremental broader search strategy"""
-        base_url = "https://nominatim.openstreetmap.org/search"
-        headers = {'User-Agent': 'AddressDistanceCalculator/3.0'}
+    def geocode_batch(self, queries):
+        """Locate (cache key, query) items: {item: (CacheEntry, from_cache) or None}"""
+        engine = self.engine
+        found = {}
+        pending = {}
+        for key, query in queries:
+            entry = engine.geocode_cache.get(key) or engine.stored_location(key)
+            if entry:
+                found[(key, query)] = (entry, True)
+            elif key not in engine.negative_cache:
+                pending.setdefault(query, []).append(key)
+        
+        def on_result(query, result, errored):
+            for key in pending[query]:
+                if result:
+                    entry = CacheEntry(*result)
+                    engine.geocode_cache.put(key, entry)
+                    found[(key, query)] = (entry, False)
+                elif not errored:
+                    engine.negative_cache.add(key)
+        
+        if pending:
+            engine.cascade.resolve(list(pending), on_result)
+        return found
+    
+    def route_batch(self, items):
+        """Route (origin, cache key, lat, lon, state) items, grouped into table requests per origin"""
+        by_origin = {}
+        for item in items:
+            by_origin.setdefault(item[0], []).append(item)
+        
+        results = {}
+        for origin, group in by_origin.items():
+            routes, _, _ = self.engine.route_sites(
+                origin, [item[1] for item in group], [item[2:4] for item in group],
+                states=[item[4] for item in group]
+            )
+            for pos, item in enumerate(group):
+                results[item] = routes.get(pos)
+        return results
+    
+    def locate(self, values, label='each point'):
+        """(lat, lon) for each [lat, lon] pair or address string - raises ValueError if invalid or not found"""
+        for value in values:
+            self.check_point(value, label)
+        lines = [v for v in values if isinstance(v, str)]
+        located = dict(zip(lines, self.geocode_batcher.submit(self.query_for(v) for v in lines)))
+        
+        points = []
+        for value in values:
+            if isinstance(value, str):
+                if not located[value]:
+                    raise ValueError(f"Could not geocode: {value}")
+                entry = located[value][0]
+                points.append((entry.lat, entry.lon))
+            else:
+                lat, lon = value
+                points.append((float(lat), float(lon)))
+        return points
+    
+    def geocode(self, body):
+        """POST /geocode {"addresses": [...]} - location of each address"""
+        addresses = self.list_field(body, 'addresses')
+        for address in addresses:
+            if not isinstance(address, str):
+                raise ValueError(f"'addresses' entries must be strings, got {json.dumps(address)}")
+        results = []
+        for address, found in zip(addresses, self.geocode_batcher.submit(self.query_for(a) for a in addresses)):
+            if found:
+                entry, cached = found
+                results.append({'address': address, 'lat': entry.lat, 'lon': entry.lon,
+                                'match_level': entry.match_level, 'match_desc': entry.match_desc,
+                                'cached': cached})
+            else:
+                results.append({'address': address, 'lat': None, 'lon': None})
+        return {'results': results}
+    
+    def rank(self, body):
+        """POST /rank {"origin": address or [lat, lon], "sites": [...], "limit": n} - ranked sites"""
+        lines = self.list_field(body, 'sites')
+        if 'origin' not in body:
+            raise ValueError("missing 'origin'")
+        limit = body.get('limit')
+        if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 1):
+            raise ValueError("'limit' must be a positive integer")
+        origin = self.locate([body['origin']], "'origin'")[0]
+        
+        sites = []
+        unparsed = 0
+        for line in lines:
+            if not isinstance(line, str):
+                raise ValueError(f"'sites' entries must be strings, got {json.dumps(line)}")
+            site = parse_address_line(line)
+            if site:
+                sites.append(site)
+            else:
+                unparsed += 1
+        
+        outcomes = {}
+        found = self.geocode_batcher.submit((site.cache_key, site.full_address) for site in sites)
+        for i, (site, result) in enumerate(zip(sites, found)):
+            if result:
+                entry, cached = result
+                site.apply_location(entry)
+                outcomes[i] = ("💾 Cached", 'cached') if cached else match_status(entry.match_level, entry.match_desc)
+            else:
+                outcomes[i] = ('✗ Not Found', 'error')
+        
+        located = [i for i, site in enumerate(sites) if site.lat and site.lon]
+        items = [(origin, sites[i].cache_key, sites[i].lat, sites[i].lon, sites[i].state) for i in located]
+        routes = {i: route for i, route in zip(located, self.route_batcher.submit(items)) if route}
+        
+        results = DistanceEngine.rank(sites, outcomes, routes)
+        limit = len(results) if limit is None else limit
+        rows = []
+        for chunk in iter_export_chunks(ResultStore(results[:limit])):
+            rows.extend(dict(zip(EXPORT_COLUMNS, row)) for row in chunk)
+        return {'origin': list(origin), 'results': rows, 'unparsed': unparsed}
+    
+    def matrix(self, body):
+        """POST /matrix {"points": [address or [lat, lon], ...]} - pairwise road matrix"""
+        values = self.list_field(body, 'points')
+        if len(values) > self.MAX_MATRIX_POINTS:
+            raise ValueError(f"At most {self.MAX_MATRIX_POINTS} points per matrix")
+        points = self.locate(values)
+        distances, durations = self.engine.pairwise_matrix(points)
+        return {
+            'points': [list(p) for p in points],
+            'distances_km': distances.round(3).tolist(),
+            'durations_min': durations.round(1).tolist()
+        }
+    
+    def stats(self):
+        """GET /stats - cache sizes, request coalescing and replica hedging counters"""
+        stats = {'requests': self.requests, 'cache_entries': len(self.engine.geocode_cache),
+                 'not_found_entries': len(self.engine.negative_cache)}
+        for name, batcher in (('geocode', self.geocode_batcher), ('route', self.route_batcher)):
+            batches, submitted, processed = batcher.counters()
+            stats[f'{name}_batches'] = batches
+            stats[f'{name}_items'] = submitted
+            stats[f'{name}_unique_items'] = processed
+        stats['geocoder_hedging'] = self.engine.geocoder.hedge_stats()
+        stats['router_hedging'] = self.engine.router.hedge_stats()
+        return stats
+
+
+def make_api_handler(api):
+    """HTTP request handler class serving a DistanceAPI as JSON"""
+    from http.server import BaseHTTPRequestHandler
+    
+    class APIHandler(BaseHTTPRequestHandler):
+        routes = {'/rank': api.rank, '/geocode': api.geocode, '/matrix': api.matrix}
         
-        parts = [p.strip() for p in address.split(',')]
-        search_attempts = []
+        def log_message(self, format, *args):
+            pass
         
-        # Attempt 1: Full address
-        search_attempts.append({
-            'query': address,
-            'level': 0,
-            'description': 'exact address'
-        })
+        def send_json(self, status, payload):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def do_GET(self):
+            if self.path == '/stats':
+                self.send_json(200, api.stats())
+            elif self.path == '/health':
+                self.send_json(200, {'status': 'ok', 'cache_ready': api.engine.cache_ready.is_set()})
+            else:
+                self.send_json(404, {'error': f"Unknown endpoint {self.path}"})
         
-        # Attempt 2: Remove shop/unit numbers
-        if len(parts) >= 3:
-            street_part = parts[0]
-            cleaned_street = re.sub(r'^(Shop|Unit|Suite|Level|T/a|Tenancy|Lot)\s*\d+[A-Za-z]?,?\s*', '', 
-                                   street_part, flags=re.IGNORECASE)
-            
-            if cleaned_street != street_part and cleaned_street.strip():
-                search_attempts.append({
-                    'query': ', '.join([cleaned_street] + parts[1:]),
-                    'level': 1,
-                    'description': 'without shop/unit'
-                })
-        
-        # Attempt 3: Suburb + State only
-        if len(parts) >= 2:
-            search_attempts.append({
-                'query': f"{parts[-2]}, {parts[-1]}",
-                'level': 3,
-                'description': 'suburb and state'
-            })
-        
-        # Try each search attempt
-        for attempt_num, attempt in enumerate(search_attempts[:max_retries], 1):
-            if attempt_num > 1:
-                time.sleep(0.5)
-            
-            params = {
-                'q': attempt['query'],
-                'format': 'json',
-                'limit': 3,
-                'countrycodes': 'au',
-                'addressdetails': 1
-            }
+        def do_POST(self):
+            handler = self.routes.get(self.path)
+            if handler is None:
+                self.send_json(404, {'error': f"Unknown endpoint {self.path}"})
+                return
             
+            api.count_request()
             try:
-                response = requests.get(base_url, params=params, headers=headers, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data:
-                    return (float(data[0]['lat']), 
-                           float(data[0]['lon']), 
-                           attempt['level'],
-                           attempt['description'])
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                self.send_json(200, handler(body))
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(400, {'error': f"Bad request: {e}"})
             except Exception as e:
-                print(f"Attempt {attempt_num} failed: {e}")
-                continue
-        
-        return None, None, None, None
+                self.send_json(500, {'error': str(e)})
     
-    def get_osrm_route(self, coord1, coord2):
-        """Get actual route distance and duration using OSRM"""
-        try:
-            lon1, lat1 = coord1[1], coord1[0]
-            lon2, lat2 = coord2[1], coord2[0]
-            
-            url = f"http://router.project-osrm.org/route/v1/driving/{lon1},{lat1};{lon2},{lat2}"
-            params = {'overview': 'false', 'steps': 'false'}
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data['code'] == 'Ok' and data['routes']:
-                route = data['routes'][0]
-                distance_km = route['distance'] / 1000
-                duration_min = route['duration'] / 60
-                return distance_km, duration_min
-            else:
-                distance_km = geodesic(coord1, coord2).kilometers
-                duration_min = (distance_km / 50) * 60
-                return distance_km, duration_min
-        except Exception as e:
-            print(f"OSRM error: {e}")
-            distance_km = geodesic(coord1, coord2).kilometers
-            duration_min = (distance_km / 50) * 60
-            return distance_km, duration_min
+    return APIHandler
+
+
+def run_serve_command(args):
+    """Command-line server mode: JSON rank/geocode/matrix endpoints over local HTTP"""
+    from http.server import ThreadingHTTPServer
     
-    def calculate_distances_worker(self, tech_addr):
-        """Worker function for calculating distances in a separate thread"""
-        try:
-            self.result_queue.put(('status', "Geocoding technician address..."))
-            tech_lat, tech_lon, tech_level, tech_desc = self.geocode_address_incremental(tech_addr)
-            
-            if not tech_lat:
-                self.result_queue.put(('error', "Could not geocode technician address"))
-                return
-            
-            tech_coords = (tech_lat, tech_lon)
-            self.result_queue.put(('progress', 0.05))
-            time.sleep(0.5)
-            
-            results = []
-            total = len(self.site_addresses)
-            
-            for i, site in enumerate(self.site_addresses):
-                if self.stop_calculation:
-                    self.result_queue.put(('status', "❌ Calculation cancelled"))
-                    return
-                
-                progress_value = 0.05 + (i + 1) / total * 0.95
-                full_address = f"{site['address']}, {site['suburb']}, {site['state']}"
-                cache_key = full_address.lower()
-                
-                if 'lat' in site and 'lon' in site and site['lat'] and site['lon']:
-                    site_lat = site['lat']
-                    site_lon = site['lon']
-                    match_level = site.get('match_level', 0)
-                    match_desc = site.get('match_desc', 'exact')
-                    
-                    self.result_queue.put(('status', f"💾 Using cached data: {site['suburb']}"))
-                    
-                    site_coords = (site_lat, site_lon)
-                    distance_km, duration_min = self.get_osrm_route(tech_coords, site_coords)
-                    
-                    status = "💾 Cached"
-                    tag = 'cached'
-                else:
-                    self.result_queue.put(('status', f"⏳ Geocoding: {site['suburb']}"))
-                    
-                    site_lat, site_lon, match_level, match_desc = self.geocode_address_incremental(full_address)
-                    
-                    if site_lat and site_lon:
-                        site_coords = (site_lat, site_lon)
-                        distance_km, duration_min = self.get_osrm_route(tech_coords, site_coords)
-                        
-                        self.geocode_cache[cache_key] = {
-                            'lat': site_lat,
-                            'lon': site_lon,
-                            'match_level': match_level,
-                            'match_desc': match_desc
-                        }
-                        
-                        site['lat'] = site_lat
-                        site['lon'] = site_lon
-                        site['match_level'] = match_level
-                        site['match_desc'] = match_desc
-                        
-                        if match_level == 0:
-                            status = "✓ Found (exact)"
-                            tag = 'success'
-                        elif match_level <= 2:
-                            status = f"✓ Found ({match_desc})"
-                            tag = 'success'
-                        else:
-                            status = f"⚠ Broad ({match_desc})"
-                            tag = 'warning'
-                    else:
-                        distance_km = float('inf')
-                        duration_min = float('inf')
-                        status = '✗ Not Found'
-                        tag = 'error'
-                        match_level = 999
-                
-                result = {
-                    'address': site['address'],
-                    'suburb': site['suburb'],
-                    'state': site['state'],
-                    'distance': distance_km,
-                    'duration': duration_min,
-                    'status': status,
-                    'tag': tag,
-                    'match_level': match_level
-                }
-                results.append(result)
-                
-                # Update the input row status in the UI
-                self.result_queue.put(('update_row', (i, status, tag)))
-                
-                self.result_queue.put(('progress', progress_value))
-                time.sleep(0.5)
-            
-            results.sort(key=lambda x: x['distance'])
-            self.result_queue.put(('results', results))
-            self.result_queue.put(('complete', None))
-            
-        except Exception as e:
-            self.result_queue.put(('error', f"Calculation error: {str(e)}"))
+    engine = DistanceEngine()
+    engine.load_caches()
+    api = DistanceAPI(engine, args.batch_window / 1000)
     
-    def process_queue(self):
-        """Process messages from the worker thread"""
-        try:
-            while not self.result_queue.empty():
-                msg_type, data = self.result_queue.get_nowait()
-                
-                if msg_type == 'status':
-                    self.status_var.set(data)
-                elif msg_type == 'progress':
-                    self.progress.set(data)
-                elif msg_type == 'results':
-                    self.all_results = data
-                    self.apply_filters()
-                elif msg_type == 'complete':
-                    self.calculation_complete()
-                elif msg_type == 'error':
-                    self.handle_calculation_error(data)
-                elif msg_type == 'update_row':
-                    # Update the status of an input row
-                    row_index, status, tag = data
-                    self.update_input_row_status(row_index, status, tag)
-        except:
-            pass
-        
-        self.root.after(100, self.process_queue)
+    server = ThreadingHTTPServer((args.host, args.port), make_api_handler(api))
+    server.daemon_threads = True
     
-    def calculation_complete(self):
-        """Handle calculation completion"""
-        self.progress.grid_remove()
-        self.calc_btn.configure(state="normal")
-        
-        # Save cache after calculation completes
-        self.save_cache()
-        
-        counts = {
-            'success': sum(1 for r in self.all_results if r['tag'] == 'success'),
-            'cached': sum(1 for r in self.all_results if r['tag'] == 'cached'),
-            'warning': sum(1 for r in self.all_results if r['tag'] == 'warning'),
-            'error': sum(1 for r in self.all_results if r['tag'] == 'error')
-        }
-        
-        summary_parts = []
-        if counts['success'] > 0:
-            summary_parts.append(f"{counts['success']} found")
-        if counts['cached'] > 0:
-            summary_parts.append(f"{counts['cached']} cached")
-        if counts['warning'] > 0:
-            summary_parts.append(f"{counts['warning']} broad")
-        if counts['error'] > 0:
-            summary_parts.append(f"{counts['error']} not found")
-        
-        summary = f"✓ Complete! " + ", ".join(summary_parts)
-        self.status_var.set(summary)
+    # Persist new cache entries periodically; saves merge with other processes
+    def save_periodically():
+        while True:
+            time.sleep(60)
+            engine.save_caches()
     
-    def handle_calculation_error(self, error_msg):
-        """Handle calculation errors"""
-        self.progress.grid_remove()
-        self.calc_btn.configure(state="normal")
-        messagebox.showerror("Calculation Error", error_msg)
-        self.status_var.set(f"✗ Error: {error_msg}")
+    threading.Thread(target=save_periodically, daemon=True).start()
     
-    def apply_filters(self):
-        """Apply filters to results display"""
-        if not self.all_results:
-            return
-        
-        self.clear_results_rows()
-        
-        filtered_results = []
-        for result in self.all_results:
-            tag = result['tag']
+    # Stop cleanly on SIGTERM too, so the caches are saved when run as a service
+    import signal
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    
+    print(f"✓ Serving on http://{args.host}:{args.port} (POST /rank, /geocode, /matrix; GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("ℹ Shutting down")
+    finally:
+        server.server_close()
+        engine.save_caches()
+
+
+def run_batch_command(args):
+    """Command-line batch mode: shard an address file across a process pool
+    
+    The technician address is geocoded once up front. Each worker process runs the
+    geocode -> route pipeline on its shards with its own engine; providers share one
+    rate limit and concurrency budget across the pool, and each worker merges its new
+    cache entries into the on-disk caches once, when it exits. Shards are merged into one ranked CSV.
+    """
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    
+    start = time.perf_counter()
+    with open(args.input, encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    if not lines:
+        print("⚠ No addresses in input file")
+        return
+    
+    engine = DistanceEngine()
+    engine.load_caches()
+    tech_lat, tech_lon, _, _ = engine.geocode(args.tech)
+    engine.save_caches()
+    if tech_lat is None:
+        print(f"⚠ Could not geocode technician address: {args.tech}")
+        sys.exit(1)
+    origin = (tech_lat, tech_lon)
+    
+    workers = args.workers or os.cpu_count() or 1
+    shard_size = args.shard_size or max(1, -(-len(lines) // (workers * 4)))
+    shards = [lines[i:i + shard_size] for i in range(0, len(lines), shard_size)]
+    print(f"ℹ {len(lines)} lines in {len(shards)} shard(s) across {workers} worker(s)")
+    
+    output = Path(args.output)
+    shard_dir = tempfile.mkdtemp(prefix='.batch-', dir=output.parent.resolve())
+    try:
+        init_args = (engine.config, engine.geocoder.shared_limits(), engine.router.shared_limits())
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                                 initargs=init_args) as pool:
+            futures = [pool.submit(run_batch_shard, i, shard, origin, shard_dir)
+                       for i, shard in enumerate(shards)]
             
-            if tag == 'success' and self.filter_vars['success'].get():
-                filtered_results.append(result)
-            elif tag == 'cached' and self.filter_vars['cached'].get():
-                filtered_results.append(result)
-            elif tag == 'warning' and self.filter_vars['broad'].get():
-                filtered_results.append(result)
-            elif tag == 'error' and self.filter_vars['not_found'].get():
-                filtered_results.append(result)
-        
-        for rank, result in enumerate(filtered_results, 1):
-            if result['distance'] == float('inf'):
-                self.add_result_row(
-                    rank, result['address'], result['suburb'], result['state'],
-                    'N/A', 'N/A', result['status'], result['tag']
-                )
-            else:
-                # Format duration using the new format_duration method
-                formatted_duration = self.format_duration(result['duration'])
-                self.add_result_row(
-                    rank, result['address'], result['suburb'], result['state'],
-                    f"{result['distance']:.2f}", formatted_duration,
-                    result['status'], result['tag']
-                )
-        
-        total = len(self.all_results)
-        showing = len(filtered_results)
-        if showing < total:
-            self.status_var.set(f"🔍 Showing {showing} of {total} results (filtered)")
+            shard_paths = []
+            results = unparsed = collapsed = matrix_routes = skipped_routes = 0
+            for done, future in enumerate(as_completed(futures), start=1):
+                path, count, skipped, stats = future.result()
+                shard_paths.append(path)
+                results += count
+                unparsed += skipped
+                collapsed += stats['collapsed_geocodes'] + stats['collapsed_routes']
+                matrix_routes += stats['matrix_routes']
+                skipped_routes += stats['skipped_routes']
+                print(f"  shard {done}/{len(shards)} done ({results} results)")
+        
+        written = merge_batch_shards(sorted(shard_paths), output)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    
+    elapsed = time.perf_counter() - start
+    print(f"✓ Wrote {written} ranked results to {output} in {elapsed:.1f}s")
+    if unparsed:
+        print(f"⚠ {unparsed} line(s) could not be parsed")
+    if collapsed:
+        print(f"ℹ {collapsed} duplicate request(s) collapsed")
+    if matrix_routes:
+        print(f"ℹ {matrix_routes} route(s) answered from the depot matrix")
+    if skipped_routes:
+        print(f"ℹ {skipped_routes} far site(s) estimated by the speed model without routing")
+
+
+def build_route_matrix(engine, depot_addresses, site_lines):
+    """Geocode depots and sites, then route every depot to every site into a RouteMatrix
+    
+    Only real router answers are stored - unroutable pairs stay NaN so runs
+    route them live (or estimate) instead of trusting a stored estimate.
+    """
+    import numpy as np
+    
+    resolved = engine.cascade.resolve(depot_addresses)
+    depots = []
+    for address in depot_addresses:
+        if resolved.get(address):
+            lat, lon = resolved[address][:2]
+            depots.append((address, lat, lon))
         else:
-            self.status_var.set(f"📊 Showing all {total} results")
+            print(f"⚠ Could not geocode depot: {address}")
     
-    def calculate_distances(self):
-        """Start distance calculation in a separate thread"""
-        tech_addr = self.tech_address.get("1.0", tk.END).strip()
-        
-        if not tech_addr:
-            messagebox.showwarning("Input Required", "Please enter the technician's address")
+    sites = {}
+    for line in site_lines:
+        site = parse_address_line(line)
+        if site and site.cache_key not in sites:
+            engine.apply_cached(site)
+            sites[site.cache_key] = site
+    
+    pending = {}
+    for site in sites.values():
+        if site.status == 'pending':
+            pending.setdefault(site.full_address, []).append(site)
+    if pending:
+        print(f"⏳ Geocoding {len(pending)} site address(es)...")
+        
+        def on_result(address, result, errored):
+            for site in pending[address]:
+                engine.record_geocode(site, result, errored)
+        
+        engine.cascade.resolve(list(pending), on_result)
+    
+    located = [site for site in sites.values() if site.lat and site.lon]
+    coords = [(site.lat, site.lon) for site in located]
+    values = np.full((len(depots), len(located), 2), np.nan, dtype=np.float32)
+    
+    router = engine.router
+    batches = [(start, coords[start:start + router.batch_size])
+               for start in range(0, len(coords), router.batch_size)]
+    for row, (address, lat, lon) in enumerate(depots):
+        def route_batch(batch):
+            try:
+                return router.table((lat, lon), batch[1])
+            except Exception as e:
+                print(f"OSRM table error: {e}")
+                return []
+        
+        with ThreadPoolExecutor(max_workers=router.concurrency) as pool:
+            for (start, _), routes in zip(batches, pool.map(route_batch, batches)):
+                for offset, route in enumerate(routes):
+                    if route:
+                        values[row, start + offset] = route
+        print(f"  depot {row + 1}/{len(depots)}: {address}")
+    
+    engine.route_matrix.save(depots, [site.cache_key for site in located], values)
+    return len(depots), len(located), int(np.isfinite(values[..., 0]).sum())
+
+
+def run_matrix_command(args):
+    """Command-line route matrix tools: build or info"""
+    engine = DistanceEngine()
+    matrix = engine.route_matrix
+    
+    if args.action == 'build':
+        if not (args.depots and args.sites):
+            print("⚠ matrix build needs --depots and --sites files")
+            sys.exit(1)
+        with open(args.depots, encoding='utf-8') as f:
+            depot_addresses = [line.strip() for line in f if line.strip()]
+        with open(args.sites, encoding='utf-8') as f:
+            site_lines = [line for line in f if line.strip()]
+        
+        start = time.perf_counter()
+        engine.load_caches()
+        depots, sites, routed = build_route_matrix(engine, depot_addresses, site_lines)
+        engine.save_caches()
+        
+        size_mb = matrix.path.stat().st_size / (1024 * 1024)
+        print(f"✓ Built route matrix: {depots} depots x {sites} sites, {routed} routes "
+              f"({size_mb:.1f} MB) in {time.perf_counter() - start:.1f}s")
+    elif args.action == 'info':
+        if not matrix.load():
+            print(f"ℹ No route matrix at {matrix.path}")
             return
-        
-        if not self.site_addresses:
-            messagebox.showwarning("Input Required", "Please add at least one site address")
+        built = read_json_file(matrix.index_path).get('built')
+        print(f"Route matrix: {matrix.path}")
+        print(f"  Depots: {len(matrix.depots)}")
+        print(f"  Sites:  {len(matrix)}")
+        if built:
+            print(f"  Built:  {time.strftime('%Y-%m-%d %H:%M', time.localtime(built))}")
+
+
+def matrix_observations(engine):
+    """Routed pairs from the depot route matrix as (origins, destinations, states, distances, durations)
+    
+    Site coordinates come from the geocode cache or store and the state from the
+    end of the site's cache key; sites that are not located are left out.
+    """
+    import numpy as np
+    
+    matrix = engine.route_matrix
+    index = read_json_file(matrix.index_path)
+    keys = index.get('sites', [])
+    coords = np.full((len(keys), 2), np.nan)
+    for col, key in enumerate(keys):
+        entry = engine.geocode_cache.get(key) or engine.stored_location(key)
+        if entry:
+            coords[col] = entry.lat, entry.lon
+    states = np.array([key.rsplit(',', 1)[-1].strip() for key in keys] or [''])
+    
+    parts = []
+    for row, depot in enumerate(index.get('depots', [])):
+        values = np.asarray(matrix.values[row], dtype=np.float64)
+        routed = np.flatnonzero(np.isfinite(coords[:, 0]) & np.isfinite(values).all(axis=1))
+        origins = np.broadcast_to((depot['lat'], depot['lon']), (len(routed), 2))
+        parts.append((origins, coords[routed], states[routed], values[routed, 0], values[routed, 1]))
+    if not parts:
+        return np.empty((0, 2)), np.empty((0, 2)), np.empty(0, dtype=str), np.empty(0), np.empty(0)
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def run_model_command(args):
+    """Command-line speed model tools: fit from the route matrix, or info"""
+    import numpy as np
+    
+    engine = DistanceEngine()
+    model = engine.speed_model
+    
+    if args.action == 'fit':
+        engine.load_caches()
+        if engine.route_matrix.values is None:
+            print("⚠ model fit needs a route matrix (build one with: matrix build)")
+            sys.exit(1)
+        start = time.perf_counter()
+        origins, destinations, states, distances, durations = matrix_observations(engine)
+        
+        # Check the error bound on routes held out of a trial fit
+        held_out = np.random.default_rng(0).random(len(distances)) < args.holdout
+        trial = SpeedModel()
+        trial.observe(origins[~held_out], destinations[~held_out], states[~held_out],
+                      distances[~held_out], durations[~held_out])
+        est_distances, est_durations, error = trial.estimate(origins[held_out], destinations[held_out],
+                                                             states[held_out])
+        
+        model = SpeedModel()
+        used = model.observe(origins, destinations, states, distances, durations)
+        model.save(engine.speed_model_file, replace=True)
+        print(f"✓ Fitted speed model from {used} routes in {time.perf_counter() - start:.1f}s")
+        
+        bounded = np.isfinite(error)
+        if bounded.any():
+            actual = durations[held_out][bounded]
+            relative = np.abs(est_durations[bounded] - actual) / actual
+            within = np.mean(relative <= error[bounded]) * 100
+            print(f"  Held-out routes: {int(bounded.sum())}, median duration error "
+                  f"{np.median(relative) * 100:.1f}%, {within:.0f}% within the reported bound")
+    elif args.action == 'info':
+        model.load(engine.speed_model_file)
+        if not len(model):
+            print(f"ℹ No speed model at {engine.speed_model_file} - estimates use "
+                  f"{FALLBACK_SPEED_KMH} km/h straight-line")
             return
-        
-        if self.calculation_thread and self.calculation_thread.is_alive():
-            messagebox.showwarning("Busy", "Calculation already in progress")
+        print(f"Speed model: {engine.speed_model_file}")
+        print(f"  Routes:  {len(model)}")
+        print(f"  Buckets: {len(model.buckets)}")
+        lower = 0
+        for band, upper in enumerate(SpeedModel.BANDS_KM + (None,)):
+            fit = model.fitted([f"*|{band}"])
+            label = f"{lower}-{upper} km" if upper else f"{lower}+ km"
+            lower = upper
+            if fit:
+                detour, pace, error = fit
+                print(f"  {label:>12}: {model.buckets[f'*|{band}'][0]:>7} routes, detour {detour:.2f}, "
+                      f"{60 / pace:.0f} km/h straight-line, ±{error * 100:.0f}%")
+
+
+def read_store_records(path, skipped):
+    """Yield (cache key, lat, lon) from an address CSV for GeocodeStore.build
+    
+    Needs address, suburb, state and lat/lon (or latitude/longitude) columns;
+    extra columns are ignored. Rows without usable coordinates are counted in
+    skipped[0].
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        lat_col = columns.get('lat') or columns.get('latitude')
+        lon_col = columns.get('lon') or columns.get('longitude')
+        if not (lat_col and lon_col and all(c in columns for c in ('address', 'suburb', 'state'))):
+            raise ValueError("CSV needs address, suburb, state, lat and lon columns")
+        
+        for row in reader:
+            try:
+                lat, lon = float(row[lat_col]), float(row[lon_col])
+            except (TypeError, ValueError):
+                skipped[0] += 1
+                continue
+            site = Site(row[columns['address']].strip(), row[columns['suburb']].strip(),
+                        row[columns['state']].strip())
+            yield site.cache_key, lat, lon
+
+
+def run_store_command(args):
+    """Command-line geocode store tools: build or info"""
+    config = load_config()
+    store = GeocodeStore(config.get('geocode_store_file', GEOCODE_STORE_FILE))
+    
+    if args.action == 'build':
+        if not args.csv:
+            print("⚠ store build needs an address CSV file")
+            sys.exit(1)
+        start = time.perf_counter()
+        skipped = [0]
+        count = GeocodeStore.build(store.path, read_store_records(args.csv, skipped))
+        size_mb = store.path.stat().st_size / (1024 * 1024)
+        print(f"✓ Built geocode store: {count} addresses ({size_mb:.1f} MB) "
+              f"in {time.perf_counter() - start:.1f}s")
+        if skipped[0]:
+            print(f"⚠ {skipped[0]} row(s) without valid coordinates skipped")
+    elif args.action == 'info':
+        if not store.load():
+            print(f"ℹ No geocode store at {store.path}")
             return
-        
-        self.progress.grid()
-        self.progress.set(0)
-        self.calc_btn.configure(state="disabled")
-        
-        self.stop_calculation = False
-        self.calculation_thread = threading.Thread(
-            target=self.calculate_distances_worker,
-            args=(tech_addr,),
-            daemon=True
-        )
-        self.calculation_thread.start()
+        size_mb = store.path.stat().st_size / (1024 * 1024)
+        print(f"Geocode store: {store.path}")
+        print(f"  Addresses: {len(store)}")
+        print(f"  Size:      {size_mb:.1f} MB")
+
+
+def read_postcode_records(path, skipped):
+    """Yield (postcode, lat, lon, state) from a postcode CSV for PostcodeIndex.build
     
-    def copy_results_smart(self):
-        """Smart copy - copies selected cells if any, otherwise copies all results"""
-        if self.selected_cells:
-            self.copy_selected_cells()
-        else:
-            self.copy_all_results()
+    Needs postcode and lat/lon (or latitude/longitude) columns; state is optional.
+    Rows without a four-digit postcode or usable coordinates are counted in skipped[0].
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        lat_col = columns.get('lat') or columns.get('latitude')
+        lon_col = columns.get('lon') or columns.get('long') or columns.get('longitude')
+        if not (lat_col and lon_col and 'postcode' in columns):
+            raise ValueError("CSV needs postcode, lat and lon columns")
+        
+        for row in reader:
+            # Spreadsheets drop the leading zero of NT postcodes (0800 -> 800)
+            postcode = (row[columns['postcode']] or '').strip()
+            postcode = postcode.zfill(4) if postcode.isdigit() else postcode
+            try:
+                lat, lon = float(row[lat_col]), float(row[lon_col])
+            except (TypeError, ValueError):
+                lat = lon = 0.0
+            if not (re.fullmatch(r'\d{4}', postcode) and (lat or lon)):
+                skipped[0] += 1
+                continue
+            state = (row[columns['state']] or '').strip() if 'state' in columns else ''
+            yield postcode, lat, lon, state
+
+
+def run_postcodes_command(args):
+    """Command-line postcode index tools: build or info"""
+    config = load_config()
+    index = PostcodeIndex(config.get('postcode_index_file', POSTCODE_INDEX_FILE))
     
-    def copy_all_results(self):
-        """Copy all results to clipboard"""
-        if not self.all_results:
-            messagebox.showinfo("No Results", "No results to copy")
+    if args.action == 'build':
+        if not args.csv:
+            print("⚠ postcodes build needs a postcode CSV file")
+            sys.exit(1)
+        skipped = [0]
+        count = PostcodeIndex.build(index.path, read_postcode_records(args.csv, skipped))
+        print(f"✓ Built postcode index: {count} postcodes")
+        if skipped[0]:
+            print(f"⚠ {skipped[0]} row(s) without a postcode or valid coordinates skipped")
+    elif args.action == 'info':
+        if not index.load():
+            print(f"ℹ No postcode index at {index.path}")
             return
-        
-        lines = ["Rank\tAddress\tSuburb\tState\tDistance (km)\tDuration (min)\tStatus"]
-        
-        for rank, result in enumerate(self.all_results, 1):
-            if result['distance'] == float('inf'):
-                line = f"{rank}\t{result['address']}\t{result['suburb']}\t{result['state']}\tN/A\tN/A\t{result['status']}"
-            else:
-                line = f"{rank}\t{result['address']}\t{result['suburb']}\t{result['state']}\t{result['distance']:.2f}\t{result['duration']:.0f}\t{result['status']}"
-            lines.append(line)
-        
-        text = '\n'.join(lines)
-        self.root.clipboard_clear()
-        self.root.clipboard_append(text)
-        
-        messagebox.showinfo("Copied", f"Copied {len(self.all_results)} results to clipboard!")
-        self.status_var.set(f"✓ Copied {len(self.all_results)} results to clipboard")
+        radii = sorted(c[2] for c in index.centroids.values())
+        print(f"Postcode index: {index.path}")
+        print(f"  Postcodes:     {len(index)}")
+        print(f"  Median radius: {radii[len(radii) // 2]:.1f} km")
 
-if __name__ == "__main__":
+
+def main():
+    """Launch the GUI, or run a command-line tool when a subcommand is given"""
+    parser = argparse.ArgumentParser(description="Address Distance Calculator")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    bench_parser = subparsers.add_parser('bench', help="Run performance benchmarks")
+    bench_parser.add_argument('suite', choices=['startup', 'memory', 'ui'], help="Benchmark to run")
+    bench_parser.add_argument('--runs', type=int, default=3, help="Repetitions per measurement")
+    bench_parser.add_argument('--sizes',
+                              help="Comma-separated record counts (memory: 10000,100000,1000000; "
+                                   f"ui: {UI_BENCH_SIZES})")
+    bench_parser.add_argument('--output', help="UI benchmark report file (default ui-bench-<time>.json)")
+    bench_parser.add_argument('--baseline', help="Earlier UI benchmark report to compare against")
+    
+    cache_parser = subparsers.add_parser('cache', help="Inspect or maintain the geocode cache")
+    cache_parser.add_argument('action', choices=['stats', 'compact', 'import', 'export', 'report'],
+                              help="Cache action")
+    cache_parser.add_argument('path', nargs='?',
+                              help="CSV/Parquet file to import or export, or an address list to report on")
+    
+    batch_parser = subparsers.add_parser('batch', help="Rank a large address file using a process pool")
+    batch_parser.add_argument('input', help="Address file, one site per line (tab, comma or pipe separated)")
+    batch_parser.add_argument('--tech', required=True, help="Technician address to measure from")
+    batch_parser.add_argument('-o', '--output', default='distance_results.csv', help="Ranked CSV to write")
+    batch_parser.add_argument('--workers', type=int, default=0, help="Worker processes (default: CPU count)")
+    batch_parser.add_argument('--shard-size', type=int, default=0,
+                              help="Lines per shard (default: about four shards per worker)")
+    
+    matrix_parser = subparsers.add_parser('matrix', help="Build or inspect the depot x site route matrix")
+    matrix_parser.add_argument('action', choices=['build', 'info'], help="Matrix action")
+    matrix_parser.add_argument('--depots', help="Depot addresses, one per line")
+    matrix_parser.add_argument('--sites', help="Site addresses, one per line (tab, comma or pipe separated)")
+    
+    store_parser = subparsers.add_parser('store', help="Build or inspect the binary geocode store")
+    store_parser.add_argument('action', choices=['build', 'info'], help="Store action")
+    store_parser.add_argument('csv', nargs='?', help="Address CSV with address, suburb, state, lat, lon columns")
+    
+    model_parser = subparsers.add_parser('model', help="Fit or inspect the road speed model")
+    model_parser.add_argument('action', choices=['fit', 'info'], help="Model action")
+    model_parser.add_argument('--holdout', type=float, default=0.2,
+                              help="Share of routes held out to check the error bound when fitting")
+    
+    postcodes_parser = subparsers.add_parser('postcodes', help="Build or inspect the postcode centroid index")
+    postcodes_parser.add_argument('action', choices=['build', 'info'], help="Postcode index action")
+    postcodes_parser.add_argument('csv', nargs='?', help="Postcode CSV with postcode, lat, lon (and state) columns")
+    
+    serve_parser = subparsers.add_parser('serve', help="Serve rank, geocode and matrix endpoints over local HTTP")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on")
+    serve_parser.add_argument('--port', type=int, default=8765, help="Port to listen on")
+    serve_parser.add_argument('--batch-window', type=float, default=20,
+                              help="Milliseconds to collect concurrent requests into one batch")
+    
+    args = parser.parse_args()
+    
+    if args.command == 'serve':
+        run_serve_command(args)
+        return
+    
+    if args.command == 'postcodes':
+        run_postcodes_command(args)
+        return
+    
+    if args.command == 'model':
+        run_model_command(args)
+        return
+    
+    if args.command == 'store':
+        run_store_command(args)
+        return
+    
+    if args.command == 'matrix':
+        run_matrix_command(args)
+        return
+    
+    if args.command == 'batch':
+        run_batch_command(args)
+        return
+    
+    if args.command == 'cache':
+        run_cache_command(args)
+        return
+    
+    if args.command == 'bench':
+        if args.suite == 'startup':
+            run_startup_benchmark(args.runs)
+        elif args.suite == 'memory':
+            run_memory_benchmark([int(n) for n in (args.sizes or '10000,100000,1000000').split(',')])
+        elif args.suite == 'ui':
+            run_ui_benchmark([int(n) for n in (args.sizes or UI_BENCH_SIZES).split(',')], args.output, args.baseline)
+        return
+    
     app = ctk.CTk()
     calculator = AddressDistanceCalculator(app)
     app.mainloop()
+
+
+if __name__ == "__main__":
+    main()